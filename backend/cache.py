@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Per-process cache whose entries expire after a fixed number of seconds.
+
+    Readers that fetch from MongoDB should take a token() before the query and
+    pass it to set(); if the key was invalidated while the query was in flight
+    the (now stale) result is dropped instead of being cached.
+
+    Entries are kept in write order, so expired entries and, at maxsize, the
+    oldest write are dropped from the front in O(1). Entries written with a
+    longer ttl than the default may shield later expired ones; those are
+    dropped on get.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._generation = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        return value
+
+    def token(self) -> int:
+        return self._generation
+
+    def set(self, key, value, token: int = None, ttl: float = None):
+        if token is not None and token != self._generation:
+            return
+        now = time.monotonic()
+        if key in self._data:
+            self._data.move_to_end(key)
+        self._data[key] = (now + (ttl if ttl is not None else self.ttl), value)
+        self._prune(now)
+
+    def invalidate(self, key):
+        self._generation += 1
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._generation += 1
+        self._data.clear()
+
+    def _prune(self, now: float):
+        """Drop expired entries from the front, then the oldest writes beyond maxsize"""
+        data = self._data
+        while data:
+            expires_at, _ = data[next(iter(data))]
+            if expires_at >= now and not (self.maxsize and len(data) > self.maxsize):
+                return
+            data.popitem(last=False)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,15 +1,105 @@
-from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from pathlib import Path
+from datetime import datetime, timezone, timedelta
+import asyncio
+import logging
 import os
 
+from cache import TTLCache
+from leveling import Leaderboard
+from mongo import get_client, get_database
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+logger = logging.getLogger('database')
+
+# MongoDB connection, shared with server.py (see mongo.py). Timestamps are
+# stored as BSON dates; the client is tz_aware, so they come back as UTC
+# datetimes, which isoformat() into the same JSON the API produced when they
+# were stored as ISO strings.
+client = get_client()
+db = get_database()
+
+def utcnow() -> datetime:
+    """Current UTC time, truncated to the millisecond precision of BSON dates"""
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def as_datetime(value):
+    """Read a timestamp as an aware UTC datetime.
+
+    Accepts datetimes and ISO 8601 strings (values stored before the datetime
+    migration, or given by API clients); strings without an offset are taken
+    as UTC. None and "" give None, invalid strings raise ValueError.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def field_projection(fields: list = None) -> dict:
+    """Projection for a list of top-level fields (always without _id); None means all"""
+    if not fields:
+        return {"_id": 0}
+    return {"_id": 0, **{field: 1 for field in fields}}
+
+def select_fields(doc: dict, fields: list = None) -> dict:
+    """The given fields of an in-memory document (a new dict), all of it if fields is None"""
+    if not fields or doc is None:
+        return doc
+    return {field: doc[field] for field in fields if field in doc}
+
+# ==================== PAGINATION ====================
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def _keyset_query(query: dict, after: str, descending: bool) -> dict:
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    
+    if not after:
+        return query
+    try:
+        cursor_id = ObjectId(after)
+    except (InvalidId, TypeError):
+        raise ValueError(f"Invalid cursor: {after}")
+    return {**query, "_id": {"$lt" if descending else "$gt": cursor_id}}
+
+async def find_page(collection, query: dict, after: str = None, limit: int = DEFAULT_PAGE_SIZE,
+                    descending: bool = False, projection: dict = None) -> dict:
+    """Get one keyset page of a query, ordered by _id.
+
+    Returns {"items": [...], "next_cursor": str or None}; pass next_cursor as
+    after to get the following page. Raises ValueError for a malformed cursor.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    docs = await collection.find(
+        _keyset_query(query, after, descending),
+        projection
+    ).sort("_id", -1 if descending else 1).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    items = [{k: v for k, v in doc.items() if k != "_id"} for doc in docs[:limit]]
+    return {"items": items, "next_cursor": next_cursor}
+
+async def iter_pages(get_page, *args, **kwargs):
+    """Yield every item of a paged helper (get_warnings, get_news, ...) for exports.
+
+    Reads MAX_PAGE_SIZE items at a time, so memory use stays bounded.
+    """
+    after = None
+    while True:
+        page = await get_page(*args, after=after, limit=MAX_PAGE_SIZE, **kwargs)
+        for item in page["items"]:
+            yield item
+        after = page["next_cursor"]
+        if not after:
+            return
 
 # Collections
 guilds_collection = db.guilds
@@ -46,6 +136,8 @@ DEFAULT_GUILD_CONFIG = {
     "level_up_channel": None,
     "level_roles": {},
     "ignored_channels": [],
+    "level_curve_base": 100,  # XP from level L to L+1: int(base * factor ** L)
+    "level_curve_factor": 1.1,
     # Voice XP
     "voice_xp_enabled": False,
     "voice_xp_per_minute": 5,
@@ -88,19 +180,42 @@ DEFAULT_GUILD_CONFIG = {
     "bot_embed_color": "#5865F2",
 }
 
-async def get_guild_config(guild_id: str) -> dict:
-    """Get or create guild configuration"""
+# Guild configs are read by nearly every gateway event, so they are cached per
+# process. Local writes invalidate immediately, writes from other processes
+# (dashboard API <-> bot) via the change stream watcher or at the latest after
+# the TTL.
+GUILD_CONFIG_CACHE_TTL = float(os.environ.get('GUILD_CONFIG_CACHE_TTL', 30))
+_guild_config_cache = TTLCache(GUILD_CONFIG_CACHE_TTL)
+
+def invalidate_guild_config(guild_id: str = None):
+    """Drop a cached guild config (or all of them)"""
+    if guild_id is None:
+        _guild_config_cache.clear()
+    else:
+        _guild_config_cache.invalidate(guild_id)
+
+async def get_guild_config(guild_id: str, fields: list = None) -> dict:
+    """Get or create guild configuration, optionally only some fields.
+
+    The full config is cached either way. Without fields the returned dict is
+    shared with the cache - copy before mutating it.
+    """
+    config = _guild_config_cache.get(guild_id)
+    if config is not None:
+        return select_fields(config, fields)
+    
+    token = _guild_config_cache.token()
     config = await guilds_collection.find_one({"guild_id": guild_id}, {"_id": 0})
     if not config:
         config = {**DEFAULT_GUILD_CONFIG, "guild_id": guild_id}
-        insert_doc = dict(config)
-        await guilds_collection.insert_one(insert_doc)
-        config = {k: v for k, v in config.items() if k != "_id"}
+        await guilds_collection.insert_one(config)
+        config.pop("_id", None)  # added by insert_one
     else:
         for key, value in DEFAULT_GUILD_CONFIG.items():
             if key not in config:
                 config[key] = value
-    return config
+    _guild_config_cache.set(guild_id, config, token=token)
+    return select_fields(config, fields)
 
 async def update_guild_config(guild_id: str, updates: dict) -> dict:
     """Update guild configuration"""
@@ -109,47 +224,125 @@ async def update_guild_config(guild_id: str, updates: dict) -> dict:
         {"$set": updates},
         upsert=True
     )
+    invalidate_guild_config(guild_id)
     return await get_guild_config(guild_id)
 
-async def get_user_data(guild_id: str, user_id: str) -> dict:
-    """Get or create user data for a guild"""
-    user = await users_collection.find_one(
+async def get_guild_configs(after: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: list = None) -> dict:
+    """Get one page of stored guild configs, optionally only some fields"""
+    projection = {field: 1 for field in fields} if fields else None
+    return await find_page(guilds_collection, {}, after, limit, projection=projection)
+
+USER_DEFAULTS = {"xp": 0, "level": 0, "messages": 0, "last_xp": None, "warnings": 0}
+
+# Top-level fields that may be requested with ?fields=
+GUILD_FIELDS = frozenset({"guild_id", *DEFAULT_GUILD_CONFIG})
+USER_FIELDS = frozenset({"guild_id", "user_id", "voice_minutes", *USER_DEFAULTS})
+SERVER_DATA_FIELDS = frozenset({"guild_id", "roles", "channels", "categories", "emojis", "last_sync"})
+
+async def get_user_data(guild_id: str, user_id: str, fields: list = None) -> dict:
+    """Get or create user data for a guild, optionally only some fields"""
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+    
+    query = {"guild_id": guild_id, "user_id": user_id}
+    projection = field_projection(fields)
+    user = await users_collection.find_one(query, projection)
+    if user is not None:
+        return user
+    
+    # Only a miss writes; $setOnInsert leaves a concurrently created user as is
+    try:
+        return await users_collection.find_one_and_update(
+            query, {"$setOnInsert": USER_DEFAULTS},
+            projection=projection, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Lost the upsert race against another writer, the document exists now
+        return await users_collection.find_one(query, projection)
+
+async def update_user_data(guild_id: str, user_id: str, updates: dict) -> dict:
+    """Update user data, creating it with defaults if needed. Returns the updated document."""
+    from pymongo import ReturnDocument
+    
+    update = {"$setOnInsert": {k: v for k, v in USER_DEFAULTS.items() if k not in updates}}
+    if updates:
+        update["$set"] = updates
+    user = await users_collection.find_one_and_update(
         {"guild_id": guild_id, "user_id": user_id},
-        {"_id": 0}
+        update,
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
-    if not user:
-        user = {
-            "guild_id": guild_id,
-            "user_id": user_id,
-            "xp": 0,
-            "level": 0,
-            "messages": 0,
-            "last_xp": None,
-            "warnings": 0
-        }
-        insert_doc = dict(user)
-        await users_collection.insert_one(insert_doc)
-        user = {k: v for k, v in user.items() if k != "_id"}
+    _record_leaderboard_xp([user])
     return user
 
-async def update_user_data(guild_id: str, user_id: str, updates: dict) -> dict:
-    """Update user data"""
-    await users_collection.update_one(
-        {"guild_id": guild_id, "user_id": user_id},
-        {"$set": updates},
-        upsert=True
+async def write_user_increments(increments: dict, updates: dict = None):
+    """Apply batched counter deltas to user documents with one unordered bulk write.
+
+    increments maps (guild_id, user_id) to {"xp": n, "messages": n, ...}, updates
+    optionally maps the same keys to fields to $set. $inc is atomic, so deltas
+    from concurrent writers are never lost. Operation i belongs to the i-th key
+    of increments, which is the index a BulkWriteError reports in writeErrors.
+    """
+    from pymongo import UpdateOne
+    
+    if not increments:
+        return
+    updates = updates or {}
+    
+    ops = []
+    for (guild_id, user_id), inc in increments.items():
+        set_fields = updates.get((guild_id, user_id), {})
+        update = {"$inc": inc}
+        if set_fields:
+            update["$set"] = set_fields
+        on_insert = {k: v for k, v in USER_DEFAULTS.items() if k not in inc and k not in set_fields}
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        ops.append(UpdateOne({"guild_id": guild_id, "user_id": user_id}, update, upsert=True))
+    await users_collection.bulk_write(ops, ordered=False)
+
+async def read_user_levels(keys) -> list:
+    """Documents (guild_id, user_id, xp, level) of (guild_id, user_id) keys, for level-up detection"""
+    if not keys:
+        return []
+    by_guild = {}
+    for guild_id, user_id in keys:
+        by_guild.setdefault(guild_id, []).append(user_id)
+    query = {"$or": [
+        {"guild_id": guild_id, "user_id": {"$in": user_ids}}
+        for guild_id, user_ids in by_guild.items()
+    ]}
+    user_docs = await users_collection.find(
+        query,
+        {"_id": 0, "guild_id": 1, "user_id": 1, "xp": 1, "level": 1}
+    ).to_list(None)
+    _record_leaderboard_xp(user_docs)
+    return user_docs
+
+async def apply_user_increments(increments: dict, updates: dict = None) -> list:
+    """write_user_increments followed by read_user_levels for the same users"""
+    await write_user_increments(increments, updates)
+    return await read_user_levels(increments)
+
+async def promote_user_level(guild_id: str, user_id: str, level: int) -> bool:
+    """Raise a user's stored level. Returns False if it was already that high,
+    so only one writer announces a given level-up."""
+    result = await users_collection.update_one(
+        {"guild_id": guild_id, "user_id": user_id, "level": {"$lt": level}},
+        {"$set": {"level": level}}
     )
-    return await get_user_data(guild_id, user_id)
+    return result.modified_count > 0
 
 async def add_warning(guild_id: str, user_id: str, mod_id: str, reason: str) -> dict:
     """Add a warning to a user"""
-    from datetime import datetime, timezone
     warning = {
         "guild_id": guild_id,
         "user_id": user_id,
         "mod_id": mod_id,
         "reason": reason,
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": utcnow()
     }
     await warnings_collection.insert_one(warning)
     await users_collection.update_one(
@@ -159,13 +352,13 @@ async def add_warning(guild_id: str, user_id: str, mod_id: str, reason: str) ->
     )
     return warning
 
-async def get_warnings(guild_id: str, user_id: str) -> list:
-    """Get all warnings for a user"""
-    warnings = await warnings_collection.find(
-        {"guild_id": guild_id, "user_id": user_id},
-        {"_id": 0}
-    ).to_list(100)
-    return warnings
+async def get_warnings(guild_id: str, user_id: str = None, after: str = None,
+                       limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """Get one page of warnings for a guild, optionally of one user"""
+    query = {"guild_id": guild_id}
+    if user_id:
+        query["user_id"] = user_id
+    return await find_page(warnings_collection, query, after, limit)
 
 async def clear_warnings(guild_id: str, user_id: str) -> int:
     """Clear all warnings for a user"""
@@ -178,88 +371,262 @@ async def clear_warnings(guild_id: str, user_id: str) -> int:
     )
     return result.deleted_count
 
-async def get_leaderboard(guild_id: str, limit: int = 10) -> list:
-    """Get XP leaderboard for a guild"""
-    users = await users_collection.find(
-        {"guild_id": guild_id},
-        {"_id": 0}
-    ).sort("xp", -1).limit(limit).to_list(limit)
+LEADERBOARD_MAX_AGE = float(os.environ.get('LEADERBOARD_MAX_AGE', 300))
+LEADERBOARD_CACHE_GUILDS = int(os.environ.get('LEADERBOARD_CACHE_GUILDS', 200))
+
+# Per-guild rankings, loaded on first use and updated by XP writes from this
+# process. Reloaded after LEADERBOARD_MAX_AGE to pick up writes by others; the
+# users collection is deliberately not watched, since every XP $inc would
+# become a change event for each process.
+_leaderboards = TTLCache(LEADERBOARD_MAX_AGE, maxsize=LEADERBOARD_CACHE_GUILDS)
+_leaderboard_locks = {}
+
+def _record_leaderboard_xp(user_docs: list):
+    for doc in user_docs:
+        board = _leaderboards.get(doc["guild_id"])
+        if board is not None:
+            board.set(doc["user_id"], doc.get("xp", 0))
+
+async def get_guild_leaderboard(guild_id: str) -> Leaderboard:
+    """Get the ranking of a guild, loading it with one projected scan if needed"""
+    board = _leaderboards.get(guild_id)
+    if board is not None:
+        return board
+    
+    lock = _leaderboard_locks.setdefault(guild_id, asyncio.Lock())
+    async with lock:
+        board = _leaderboards.get(guild_id)
+        if board is None:
+            token = _leaderboards.token()
+            board = Leaderboard()
+            board.load([
+                (doc["user_id"], doc.get("xp", 0))
+                async for doc in users_collection.find({"guild_id": guild_id}, {"_id": 0, "user_id": 1, "xp": 1})
+            ])
+            _leaderboards.set(guild_id, board, token=token)
+    if not lock.locked():
+        _leaderboard_locks.pop(guild_id, None)
+    return board
+
+async def get_leaderboard(guild_id: str, limit: int = 10, offset: int = 0) -> list:
+    """Get XP leaderboard for a guild, starting at rank offset + 1"""
+    board = await get_guild_leaderboard(guild_id)
+    user_ids = [user_id for user_id, _ in board.page(offset, limit)]
+    if not user_ids:
+        return []
+    users = {
+        user["user_id"]: user
+        async for user in users_collection.find({"guild_id": guild_id, "user_id": {"$in": user_ids}}, {"_id": 0})
+    }
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+async def get_user_rank(guild_id: str, user_id: str) -> dict:
+    """Get a user's leaderboard position as {"rank": n or None, "total": n}"""
+    board = await get_guild_leaderboard(guild_id)
+    return {"rank": board.rank(user_id), "total": len(board)}
+
+# Names and avatars of members, written by the bot so the API (and the bot for
+# members missing from its cache) can render user lists without Discord calls.
+# Profiles of users the bot hasn't seen for USER_PROFILE_EXPIRE_DAYS are dropped
+# by a TTL index.
+user_profiles_collection = db.user_profiles
+USER_PROFILE_EXPIRE_DAYS = int(os.environ.get('USER_PROFILE_EXPIRE_DAYS', 30))
+
+async def save_user_profiles(guild_id: str, profiles: list) -> int:
+    """Upsert profiles ({"user_id", "name", "display_name", "avatar_url"}) in one bulk write"""
+    from pymongo import UpdateOne
+    
+    if not profiles:
+        return 0
+    now = utcnow()
+    ops = [
+        UpdateOne(
+            {"guild_id": guild_id, "user_id": profile["user_id"]},
+            {"$set": {**profile, "guild_id": guild_id, "updated_at": now}},
+            upsert=True
+        )
+        for profile in profiles
+    ]
+    result = await user_profiles_collection.bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count
+
+async def get_user_profiles(guild_id: str, user_ids: list) -> dict:
+    """Get stored profiles for many users with one query, keyed by user_id"""
+    if not user_ids:
+        return {}
+    return {
+        profile["user_id"]: profile
+        async for profile in user_profiles_collection.find(
+            {"guild_id": guild_id, "user_id": {"$in": list(user_ids)}},
+            {"_id": 0, "guild_id": 0}
+        )
+    }
+
+async def attach_user_profiles(guild_id: str, users: list) -> list:
+    """Add display_name and avatar_url (None if unknown) to user documents in place"""
+    profiles = await get_user_profiles(guild_id, [user["user_id"] for user in users])
+    for user in users:
+        profile = profiles.get(user["user_id"], {})
+        user["display_name"] = profile.get("display_name") or profile.get("name")
+        user["avatar_url"] = profile.get("avatar_url")
     return users
 
+CUSTOM_COMMAND_CACHE_TTL = float(os.environ.get('CUSTOM_COMMAND_CACHE_TTL', 60))
+
+_custom_command_cache = TTLCache(CUSTOM_COMMAND_CACHE_TTL)
+
+def invalidate_custom_commands(guild_id: str = None):
+    """Drop a guild's cached command index (or all of them)"""
+    if guild_id is None:
+        _custom_command_cache.clear()
+    else:
+        _custom_command_cache.invalidate(guild_id)
+
+async def get_custom_command_index(guild_id: str) -> dict:
+    """Get a guild's custom commands as a name -> response dict, loaded lazily"""
+    index = _custom_command_cache.get(guild_id)
+    if index is not None:
+        return index
+    
+    token = _custom_command_cache.token()
+    index = {}
+    async for cmd in custom_commands_collection.find(
+        {"guild_id": guild_id},
+        {"_id": 0, "name": 1, "response": 1}
+    ):
+        index[cmd["name"]] = cmd["response"]
+    _custom_command_cache.set(guild_id, index, token=token)
+    return index
+
+async def get_custom_command_response(guild_id: str, name: str) -> str:
+    """Look up a custom command's response, None if it doesn't exist"""
+    index = await get_custom_command_index(guild_id)
+    return index.get(name.lower())
+
 async def add_custom_command(guild_id: str, name: str, response: str, created_by: str) -> dict:
     """Add a custom command"""
-    from datetime import datetime, timezone
     command = {
         "guild_id": guild_id,
         "name": name.lower(),
         "response": response,
         "created_by": created_by,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     await custom_commands_collection.update_one(
         {"guild_id": guild_id, "name": name.lower()},
         {"$set": command},
         upsert=True
     )
+    invalidate_custom_commands(guild_id)
     return command
 
-async def get_custom_commands(guild_id: str) -> list:
-    """Get all custom commands for a guild"""
-    commands = await custom_commands_collection.find(
-        {"guild_id": guild_id},
-        {"_id": 0}
-    ).to_list(100)
-    return commands
+async def get_custom_commands(guild_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """Get one page of custom commands for a guild"""
+    return await find_page(custom_commands_collection, {"guild_id": guild_id}, after, limit)
 
 async def delete_custom_command(guild_id: str, name: str) -> bool:
     """Delete a custom command"""
     result = await custom_commands_collection.delete_one(
         {"guild_id": guild_id, "name": name.lower()}
     )
+    invalidate_custom_commands(guild_id)
     return result.deleted_count > 0
 
+# Unposted scheduled news carry a due_at date: the next time the scheduler
+# should try to post them. It only exists on pending items (partial index),
+# is pushed back by NEWS_CLAIM_LEASE when an instance claims an item and is
+# removed once the item is posted.
+NEWS_CLAIM_LEASE = timedelta(seconds=float(os.environ.get('NEWS_CLAIM_LEASE', 300)))
+
 async def add_news(guild_id: str, title: str, content: str, scheduled_for: str = None, created_by: str = None) -> dict:
-    """Add a news item"""
-    from datetime import datetime, timezone
+    """Add a news item. Raises ValueError for an invalid scheduled_for."""
     import uuid
+    due_at = as_datetime(scheduled_for)
     news = {
         "id": str(uuid.uuid4()),
         "guild_id": guild_id,
         "title": title,
         "content": content,
-        "scheduled_for": scheduled_for,
+        "scheduled_for": due_at,
         "created_by": created_by,
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "created_at": utcnow(),
         "posted": False
     }
     insert_doc = dict(news)
+    if due_at:
+        insert_doc["due_at"] = due_at
     await news_collection.insert_one(insert_doc)
     return {k: v for k, v in news.items() if k != "_id"}
 
-async def get_news(guild_id: str) -> list:
-    """Get all news for a guild"""
-    news = await news_collection.find(
-        {"guild_id": guild_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    return news
+async def get_news(guild_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """Get one page of news for a guild, newest first"""
+    return await find_page(
+        news_collection, {"guild_id": guild_id}, after, limit,
+        descending=True, projection={"due_at": 0, "claimed_by": 0}
+    )
 
 async def delete_news(news_id: str) -> bool:
     """Delete a news item"""
     result = await news_collection.delete_one({"id": news_id})
     return result.deleted_count > 0
 
+async def get_upcoming_news(limit: int = 100) -> list:
+    """Get unposted scheduled news of all guilds, earliest due first"""
+    return await news_collection.find(
+        {"due_at": {"$exists": True}},
+        {"_id": 0, "id": 1, "guild_id": 1, "due_at": 1}
+    ).sort("due_at", 1).limit(limit).to_list(limit)
+
+async def claim_due_news(news_id: str, worker_id: str) -> dict:
+    """Atomically claim a due news item for posting.
+
+    Moves due_at NEWS_CLAIM_LEASE into the future, so other bot processes skip
+    the item; if it isn't marked posted by then, it is claimed again. Returns
+    None if the item is gone, posted or claimed by someone else.
+    """
+    from pymongo import ReturnDocument
+    
+    now = utcnow()
+    return await news_collection.find_one_and_update(
+        {"id": news_id, "due_at": {"$lte": now}},
+        {"$set": {"due_at": now + NEWS_CLAIM_LEASE, "claimed_by": worker_id}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
 async def mark_news_posted(news_id: str) -> bool:
     """Mark news as posted"""
     result = await news_collection.update_one(
         {"id": news_id},
-        {"$set": {"posted": True}}
+        {
+            "$set": {"posted": True, "posted_at": utcnow()},
+            "$unset": {"due_at": "", "claimed_by": ""}
+        }
     )
     return result.modified_count > 0
 
+async def backfill_news_due_times() -> int:
+    """Give scheduled news created before due_at existed a due time"""
+    from pymongo import UpdateOne
+    
+    ops = []
+    async for news in news_collection.find(
+        {"posted": False, "scheduled_for": {"$nin": [None, ""]}, "due_at": {"$exists": False}},
+        {"_id": 0, "id": 1, "scheduled_for": 1}
+    ):
+        try:
+            due_at = as_datetime(news["scheduled_for"])
+        except ValueError:
+            logger.warning(f"News {news['id']} has an invalid scheduled_for: {news['scheduled_for']!r}")
+            continue
+        ops.append(UpdateOne({"id": news["id"], "posted": False}, {"$set": {"due_at": due_at}}))
+    if not ops:
+        return 0
+    result = await news_collection.bulk_write(ops, ordered=False)
+    return result.modified_count
+
 async def add_mod_log(guild_id: str, action: str, mod_id: str, target_id: str, reason: str) -> dict:
     """Add a moderation log entry"""
-    from datetime import datetime, timezone
     import uuid
     log = {
         "id": str(uuid.uuid4()),
@@ -268,24 +635,77 @@ async def add_mod_log(guild_id: str, action: str, mod_id: str, target_id: str, r
         "mod_id": mod_id,
         "target_id": target_id,
         "reason": reason,
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": utcnow()
     }
     await mod_logs_collection.insert_one(log)
     return log
 
-async def get_mod_logs(guild_id: str, limit: int = 50) -> list:
-    """Get moderation logs for a guild"""
-    logs = await mod_logs_collection.find(
-        {"guild_id": guild_id},
-        {"_id": 0}
-    ).sort("timestamp", -1).limit(limit).to_list(limit)
-    return logs
+async def get_mod_logs(guild_id: str, after: str = None, limit: int = 50) -> dict:
+    """Get one page of moderation logs for a guild, newest first"""
+    return await find_page(mod_logs_collection, {"guild_id": guild_id}, after, limit, descending=True)
 
 # ==================== TEMP CHANNELS ====================
 
+class ChannelRegistry:
+    """In-memory channel_id -> document map for collections keyed by a channel.
+
+    Entries are keyed by the document _id, because change stream delete events
+    only carry the _id. fields limits what is kept per document.
+    """
+    def __init__(self, fields: list = None):
+        self.fields = fields
+        self.loaded = False
+        self.docs = {}  # _id -> document without _id
+        self.by_channel = {}  # channel_id -> _id
+    
+    def load(self, docs: list):
+        self.docs = {}
+        self.by_channel = {}
+        for doc in docs:
+            self.put(doc)
+        self.loaded = True
+    
+    def put(self, doc: dict):
+        self.remove(doc["_id"])
+        if not doc.get("channel_id"):
+            return
+        if self.fields:
+            entry = {k: doc[k] for k in self.fields if k in doc}
+        else:
+            entry = {k: v for k, v in doc.items() if k != "_id"}
+        self.docs[doc["_id"]] = entry
+        self.by_channel[doc["channel_id"]] = doc["_id"]
+    
+    def remove(self, doc_id):
+        entry = self.docs.pop(doc_id, None)
+        if entry and self.by_channel.get(entry["channel_id"]) == doc_id:
+            del self.by_channel[entry["channel_id"]]
+    
+    def get(self, channel_id: str) -> dict:
+        doc_id = self.by_channel.get(channel_id)
+        return self.docs[doc_id] if doc_id is not None else None
+    
+    def __contains__(self, channel_id: str) -> bool:
+        return channel_id in self.by_channel
+
+temp_channel_registry = ChannelRegistry(fields=["guild_id", "channel_id"])
+temp_creator_registry = ChannelRegistry()
+
+async def load_temp_channel_registries():
+    """(Re)load the temp channel and temp creator registries"""
+    temp_channel_registry.load(
+        await temp_channels_collection.find({}, {"_id": 1, "guild_id": 1, "channel_id": 1}).to_list(None)
+    )
+    temp_creator_registry.load(await temp_creators_collection.find({}).to_list(None))
+
+async def is_temp_channel(channel_id: str) -> bool:
+    """Whether a channel is a live temp channel, answered from memory once loaded"""
+    if temp_channel_registry.loaded:
+        return channel_id in temp_channel_registry
+    return await get_temp_channel(channel_id) is not None
+
 async def create_temp_channel(guild_id: str, channel_id: str, owner_id: str, name: str, creator_id: str = None) -> dict:
     """Create a temp channel record"""
-    from datetime import datetime, timezone
     channel = {
         "guild_id": guild_id,
         "channel_id": channel_id,
@@ -298,9 +718,10 @@ async def create_temp_channel(guild_id: str, channel_id: str, owner_id: str, nam
         "hidden": False,
         "permitted_users": [],
         "banned_users": [],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     await temp_channels_collection.insert_one(channel)
+    temp_channel_registry.put(channel)
     return {k: v for k, v in channel.items() if k != "_id"}
 
 async def get_temp_channel(channel_id: str) -> dict:
@@ -311,13 +732,9 @@ async def get_temp_channel(channel_id: str) -> dict:
     )
     return channel
 
-async def get_temp_channels(guild_id: str) -> list:
-    """Get all temp channels for a guild"""
-    channels = await temp_channels_collection.find(
-        {"guild_id": guild_id},
-        {"_id": 0}
-    ).to_list(100)
-    return channels
+async def get_temp_channels(guild_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """Get one page of temp channels for a guild"""
+    return await find_page(temp_channels_collection, {"guild_id": guild_id}, after, limit)
 
 async def update_temp_channel(channel_id: str, updates: dict) -> dict:
     """Update temp channel"""
@@ -329,16 +746,111 @@ async def update_temp_channel(channel_id: str, updates: dict) -> dict:
 
 async def delete_temp_channel(channel_id: str) -> bool:
     """Delete temp channel record"""
-    result = await temp_channels_collection.delete_one({"channel_id": channel_id})
-    return result.deleted_count > 0
+    result = await temp_channels_collection.find_one_and_delete({"channel_id": channel_id}, {"_id": 1})
+    if not result:
+        return False
+    temp_channel_registry.remove(result["_id"])
+    return True
 
 # ==================== REACTION ROLES ====================
 
+class ReactionRoleIndex:
+    """In-memory routing table (message_id, emoji) -> role ids over all reaction roles.
+
+    Also tracks which roles each reaction role's buttons (rr_{id}_{role_id})
+    may hand out. Entries are keyed by the document _id, because change stream
+    delete events only carry the _id.
+    """
+    def __init__(self):
+        self.loaded = False
+        self.entries = {}  # _id -> (message_id, emoji, role_id)
+        self.routes = {}  # (message_id, emoji) -> {_id: role_id}
+        self.button_ids = {}  # _id -> reaction role id
+        self.buttons = {}  # reaction role id -> role ids
+    
+    def load(self, docs: list):
+        self.entries = {}
+        self.routes = {}
+        self.button_ids = {}
+        self.buttons = {}
+        for doc in docs:
+            self.put(doc)
+        self.loaded = True
+    
+    def put(self, doc: dict):
+        self.remove(doc["_id"])
+        if doc.get("id"):
+            role_ids = {r.get("role_id") for r in doc.get("roles") or [] if r.get("role_id")}
+            if doc.get("role_id"):
+                role_ids.add(doc["role_id"])
+            self.button_ids[doc["_id"]] = doc["id"]
+            self.buttons[doc["id"]] = role_ids
+        if not doc.get("message_id") or not doc.get("emoji") or not doc.get("role_id"):
+            return
+        route = (doc["message_id"], doc["emoji"])
+        self.entries[doc["_id"]] = (route[0], route[1], doc["role_id"])
+        self.routes.setdefault(route, {})[doc["_id"]] = doc["role_id"]
+    
+    def remove(self, doc_id):
+        rr_id = self.button_ids.pop(doc_id, None)
+        if rr_id:
+            self.buttons.pop(rr_id, None)
+        entry = self.entries.pop(doc_id, None)
+        if not entry:
+            return
+        route = (entry[0], entry[1])
+        role_ids = self.routes.get(route, {})
+        role_ids.pop(doc_id, None)
+        if not role_ids:
+            self.routes.pop(route, None)
+    
+    def remove_message(self, message_id: str):
+        for doc_id, entry in list(self.entries.items()):
+            if entry[0] == message_id:
+                self.remove(doc_id)
+    
+    def lookup(self, message_id: str, emoji: str) -> list:
+        return list(self.routes.get((message_id, emoji), {}).values())
+    
+    def has_button(self, rr_id: str, role_id: str) -> bool:
+        return role_id in self.buttons.get(rr_id, ())
+
+reaction_role_index = ReactionRoleIndex()
+
+REACTION_ROLE_INDEX_FIELDS = {"_id": 1, "id": 1, "message_id": 1, "emoji": 1, "role_id": 1, "roles.role_id": 1}
+
+async def load_reaction_role_index() -> int:
+    """(Re)load the reaction role routing table, returns the number of routes"""
+    docs = await reaction_roles_collection.find({}, REACTION_ROLE_INDEX_FIELDS).to_list(None)
+    reaction_role_index.load(docs)
+    return len(reaction_role_index.routes)
+
+async def get_reaction_role_ids(message_id: str, emoji: str) -> list:
+    """Role ids for a reaction, served from the routing table once it is loaded"""
+    if reaction_role_index.loaded:
+        return reaction_role_index.lookup(message_id, emoji)
+    rrs = await get_reaction_role_by_message(message_id, emoji)
+    return [rr["role_id"] for rr in rrs if rr.get("role_id")]
+
+async def reaction_role_grants(rr_id: str, role_id: str) -> bool:
+    """Whether a reaction role's button may hand out a role"""
+    if reaction_role_index.loaded:
+        return reaction_role_index.has_button(rr_id, role_id)
+    rr = await reaction_roles_collection.find_one({"id": rr_id}, {"_id": 0, "role_id": 1, "roles.role_id": 1})
+    if not rr:
+        return False
+    return role_id == rr.get("role_id") or any(r.get("role_id") == role_id for r in rr.get("roles") or [])
+
+async def insert_reaction_role(rr: dict) -> dict:
+    """Store a reaction role document and add it to the routing table"""
+    await reaction_roles_collection.insert_one(rr)
+    reaction_role_index.put(rr)
+    return {k: v for k, v in rr.items() if k != "_id"}
+
 async def create_reaction_role(guild_id: str, channel_id: str, message_id: str, 
                                 emoji: str, role_id: str, role_type: str = "reaction",
                                 title: str = None, description: str = None) -> dict:
     """Create a reaction role"""
-    from datetime import datetime, timezone
     import uuid
     rr = {
         "id": str(uuid.uuid4()),
@@ -350,18 +862,13 @@ async def create_reaction_role(guild_id: str, channel_id: str, message_id: str,
         "role_type": role_type,  # "reaction", "button", "dropdown"
         "title": title,
         "description": description,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
-    await reaction_roles_collection.insert_one(rr)
-    return {k: v for k, v in rr.items() if k != "_id"}
+    return await insert_reaction_role(rr)
 
-async def get_reaction_roles(guild_id: str) -> list:
-    """Get all reaction roles for a guild"""
-    rrs = await reaction_roles_collection.find(
-        {"guild_id": guild_id},
-        {"_id": 0}
-    ).to_list(100)
-    return rrs
+async def get_reaction_roles(guild_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """Get one page of reaction roles for a guild"""
+    return await find_page(reaction_roles_collection, {"guild_id": guild_id}, after, limit)
 
 async def get_reaction_role_by_message(message_id: str, emoji: str = None) -> list:
     """Get reaction roles by message ID"""
@@ -382,17 +889,22 @@ async def update_reaction_role(rr_id: str, data: dict) -> dict:
         return_document=True
     )
     if result:
+        reaction_role_index.put(result)
         return {k: v for k, v in result.items() if k != "_id"}
     return None
 
 async def delete_reaction_role(rr_id: str) -> bool:
     """Delete a reaction role"""
-    result = await reaction_roles_collection.delete_one({"id": rr_id})
-    return result.deleted_count > 0
+    result = await reaction_roles_collection.find_one_and_delete({"id": rr_id}, {"_id": 1})
+    if not result:
+        return False
+    reaction_role_index.remove(result["_id"])
+    return True
 
 async def delete_reaction_roles_by_message(message_id: str) -> int:
     """Delete all reaction roles for a message"""
     result = await reaction_roles_collection.delete_many({"message_id": message_id})
+    reaction_role_index.remove_message(message_id)
     return result.deleted_count
 
 # ==================== GAMES ====================
@@ -400,7 +912,6 @@ async def delete_reaction_roles_by_message(message_id: str) -> int:
 async def create_game(guild_id_or_data = None, channel_id: str = None, game_type: str = None, 
                       player1_id: str = None, player2_id: str = None, state: dict = None) -> dict:
     """Create a game - accepts either individual params or a dict"""
-    from datetime import datetime, timezone
     import uuid
     
     # Support both calling patterns
@@ -418,7 +929,7 @@ async def create_game(guild_id_or_data = None, channel_id: str = None, game_type
             "state": data.get("state", {}),
             "status": data.get("status", "active"),
             "winner_id": data.get("winner_id"),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         }
     else:
         # Called with individual params
@@ -432,7 +943,7 @@ async def create_game(guild_id_or_data = None, channel_id: str = None, game_type
             "state": state or {},
             "status": "waiting" if player2_id is None else "active",
             "winner_id": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         }
     
     await games_collection.insert_one(game)
@@ -470,7 +981,6 @@ server_data_collection = db.server_data
 
 async def sync_server_data(guild_id: str, roles: list, channels: list, categories: list, emojis: list) -> dict:
     """Sync all server data (roles, channels, categories, emojis)"""
-    from datetime import datetime, timezone
     
     data = {
         "guild_id": guild_id,
@@ -478,7 +988,7 @@ async def sync_server_data(guild_id: str, roles: list, channels: list, categorie
         "channels": channels,
         "categories": categories,
         "emojis": emojis,
-        "last_sync": datetime.now(timezone.utc).isoformat()
+        "last_sync": utcnow()
     }
     
     await server_data_collection.update_one(
@@ -488,13 +998,71 @@ async def sync_server_data(guild_id: str, roles: list, channels: list, categorie
     )
     return data
 
-async def get_server_data(guild_id: str) -> dict:
-    """Get cached server data"""
+async def apply_server_data_changes(guild_id: str, changes: list) -> int:
+    """Apply targeted updates to a guild's synced server data.
+
+    changes is a list of (kind, entity_id, entity) with kind one of roles,
+    channels, categories, emojis. An entity of None removes the entry, otherwise
+    it replaces the entry with the same id or is appended. Returns the number
+    of matched operations; 0 means there is no server data document yet and a
+    full sync is needed.
+    """
+    from pymongo import UpdateOne
+    
+    now = utcnow()
+    ops = []
+    for kind, entity_id, entity in changes:
+        if entity is None:
+            ops.append(UpdateOne(
+                {"guild_id": guild_id},
+                {"$pull": {kind: {"id": entity_id}}, "$set": {"last_sync": now}}
+            ))
+        else:
+            # Replace in place if present...
+            ops.append(UpdateOne(
+                {"guild_id": guild_id, f"{kind}.id": entity_id},
+                {"$set": {f"{kind}.$": entity, "last_sync": now}}
+            ))
+            # ...append otherwise
+            ops.append(UpdateOne(
+                {"guild_id": guild_id, f"{kind}.id": {"$ne": entity_id}},
+                {"$push": {kind: entity}, "$set": {"last_sync": now}}
+            ))
+    if not ops:
+        return 0
+    result = await server_data_collection.bulk_write(ops, ordered=True)
+    return result.matched_count
+
+async def get_server_data(guild_id: str, fields: list = None) -> dict:
+    """Get cached server data, optionally only some fields (e.g. ["roles"])"""
     data = await server_data_collection.find_one(
         {"guild_id": guild_id},
-        {"_id": 0}
+        field_projection(fields)
+    )
+    return data or select_fields(
+        {"guild_id": guild_id, "roles": [], "channels": [], "categories": [], "emojis": []}, fields
     )
-    return data or {"guild_id": guild_id, "roles": [], "channels": [], "categories": [], "emojis": []}
+
+async def get_server_data_version(guild_id: str):
+    """last_sync of a guild's server data (None if never synced), read without the data itself"""
+    data = await server_data_collection.find_one({"guild_id": guild_id}, {"_id": 0, "last_sync": 1})
+    return as_datetime(data.get("last_sync")) if data else None
+
+async def get_server_entities(guild_id: str, field: str, search: str = None, **filters) -> list:
+    """Entries of one server data list (roles, channels, categories, emojis).
+
+    Only that list is loaded. search matches names case-insensitively,
+    filters must match exactly (None values are ignored).
+    """
+    data = await get_server_data(guild_id, [field])
+    entities = data.get(field) or []
+    filters = {key: value for key, value in filters.items() if value is not None}
+    if filters:
+        entities = [e for e in entities if all(e.get(key) == value for key, value in filters.items())]
+    if search:
+        search = search.casefold()
+        entities = [e for e in entities if search in (e.get("name") or "").casefold()]
+    return entities
 
 # ==================== LEVEL REWARDS ====================
 
@@ -538,70 +1106,157 @@ async def toggle_level_reward(reward_id: str, enabled: bool) -> bool:
 
 # ==================== VOICE XP TRACKING ====================
 
+# Voice sessions are tracked in the bot's memory. voice_sessions is an
+# append-only ledger of finished sessions; voice_presence mirrors the open ones
+# for the dashboard and for resuming them after a restart.
 voice_sessions_collection = db.voice_sessions
+voice_presence_collection = db.voice_presence
 
-async def start_voice_session(guild_id: str, user_id: str, channel_id: str) -> dict:
-    """Start tracking a voice session"""
-    from datetime import datetime, timezone
-    
-    session = {
-        "guild_id": guild_id,
-        "user_id": user_id,
-        "channel_id": channel_id,
-        "started_at": datetime.now(timezone.utc).isoformat(),
-        "ended_at": None,
-        "xp_awarded": 0
-    }
-    
-    await voice_sessions_collection.update_one(
-        {"guild_id": guild_id, "user_id": user_id, "ended_at": None},
-        {"$set": session},
-        upsert=True
-    )
-    return session
+async def insert_voice_sessions(sessions: list) -> int:
+    """Append finished sessions to the ledger.
 
-async def end_voice_session(guild_id: str, user_id: str) -> dict:
-    """End a voice session and calculate XP"""
-    from datetime import datetime, timezone
+    Sessions are identified by their id, so re-inserting a batch after a
+    failed flush or a crash skips the ones already stored.
+    """
+    from pymongo.errors import BulkWriteError
     
-    session = await voice_sessions_collection.find_one(
-        {"guild_id": guild_id, "user_id": user_id, "ended_at": None},
-        {"_id": 0}
-    )
+    if not sessions:
+        return 0
+    try:
+        result = await voice_sessions_collection.insert_many([dict(s) for s in sessions], ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nInserted", 0)
+
+async def sync_voice_presence(changes: dict) -> None:
+    """Mirror open sessions: session id -> session to store, or None once it ended"""
+    from pymongo import ReplaceOne, DeleteOne
     
-    if not session:
-        return None
+    ops = [
+        ReplaceOne({"id": session_id}, session, upsert=True) if session else DeleteOne({"id": session_id})
+        for session_id, session in changes.items()
+    ]
+    if ops:
+        await voice_presence_collection.bulk_write(ops, ordered=False)
+
+async def load_open_voice_sessions() -> list:
+    """Open sessions as last mirrored by the bot, for resuming them on startup.
+
+    Open rows left in the ledger by the former write-through tracking are
+    moved over (and removed from the ledger) so they get closed properly.
+    """
+    import uuid
+    
+    sessions = await voice_presence_collection.find({}, {"_id": 0}).to_list(None)
+    legacy = await voice_sessions_collection.find({"ended_at": None}, {"_id": 0}).to_list(None)
+    if legacy:
+        await voice_sessions_collection.delete_many({"ended_at": None})
+        for session in legacy:
+            session.pop("xp_awarded", None)
+            session.setdefault("id", str(uuid.uuid4()))
+            session["started_at"] = as_datetime(session["started_at"])
+        sessions.extend(legacy)
+    return sessions
+
+async def get_active_voice_sessions(guild_id: str, after: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """Get one page of active voice sessions, as last mirrored by the bot"""
+    return await find_page(voice_presence_collection, {"guild_id": guild_id}, after, limit)
+
+# ==================== ACTIVITY ROLLUPS ====================
+
+# Pre-aggregated hourly activity per guild: one document per (guild, hour)
+# with counters, so time series are an index range scan whatever the history
+# size. High-frequency counters are buffered by the bot and added in batches;
+# rare events (tickets) are added directly.
+activity_rollups_collection = db.activity_rollups
+
+ACTIVITY_FIELDS = ("messages", "xp", "voice_minutes", "active_users", "tickets_opened", "tickets_closed")
+ACTIVITY_GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+ACTIVITY_MAX_BUCKETS = 24 * 31
+
+def activity_bucket(when: datetime = None, granularity: str = "hour") -> datetime:
+    """Start of the hour (or day) a time falls into"""
+    when = when or utcnow()
+    if granularity == "day":
+        return when.replace(hour=0, minute=0, second=0, microsecond=0)
+    return when.replace(minute=0, second=0, microsecond=0)
+
+async def apply_activity_increments(increments: dict) -> int:
+    """Add counters to hourly rollups with one bulk write.
+
+    increments maps (guild_id, bucket) -> {field: amount}.
+    """
+    from pymongo import UpdateOne
     
-    ended_at = datetime.now(timezone.utc)
-    started_at = datetime.fromisoformat(session["started_at"].replace("Z", "+00:00"))
-    duration_minutes = (ended_at - started_at).total_seconds() / 60
+    ops = [
+        UpdateOne(
+            {"guild_id": guild_id, "bucket": bucket},
+            {"$inc": counters},
+            upsert=True
+        )
+        for (guild_id, bucket), counters in increments.items() if counters
+    ]
+    if not ops:
+        return 0
+    result = await activity_rollups_collection.bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count
+
+async def record_activity(guild_id: str, **counters) -> None:
+    """Add to the current hour's counters right away, for rare events.
+
+    Callers have already done the actual write (e.g. created a ticket), so a
+    failing stats update is logged instead of raised.
+    """
+    try:
+        await apply_activity_increments({(guild_id, activity_bucket()): counters})
+    except Exception as e:
+        logger.error(f"Activity rollup update failed for {guild_id} {counters}: {e}")
+
+async def get_activity_series(guild_id: str, start: datetime, end: datetime, granularity: str = "hour") -> list:
+    """Activity counters per hour or day from start up to (excluding) end.
+
+    Every bucket of the range is returned, empty ones with zeros. Raises
+    ValueError for an unknown granularity or a range over
+    ACTIVITY_MAX_BUCKETS buckets.
+    """
+    if granularity not in ACTIVITY_GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    step = ACTIVITY_GRANULARITIES[granularity]
+    start = activity_bucket(as_datetime(start), granularity)
+    end = as_datetime(end)
+    if end <= start:
+        return []
+    if (end - start) / step > ACTIVITY_MAX_BUCKETS:
+        raise ValueError(f"Range too large, at most {ACTIVITY_MAX_BUCKETS} buckets")
     
-    await voice_sessions_collection.update_one(
-        {"guild_id": guild_id, "user_id": user_id, "ended_at": None},
-        {"$set": {"ended_at": ended_at.isoformat()}}
-    )
+    series = {}
+    bucket = start
+    while bucket < end:
+        series[bucket] = {"bucket": bucket, **{field: 0 for field in ACTIVITY_FIELDS}}
+        bucket += step
     
-    session["ended_at"] = ended_at.isoformat()
-    session["duration_minutes"] = duration_minutes
-    return session
-
-async def get_active_voice_sessions(guild_id: str) -> list:
-    """Get all active voice sessions"""
-    sessions = await voice_sessions_collection.find(
-        {"guild_id": guild_id, "ended_at": None},
-        {"_id": 0}
-    ).to_list(1000)
-    return sessions
+    async for rollup in activity_rollups_collection.find(
+        {"guild_id": guild_id, "bucket": {"$gte": start, "$lt": end}},
+        {"_id": 0, "guild_id": 0}
+    ):
+        point = series[activity_bucket(rollup["bucket"], granularity)]
+        for field in ACTIVITY_FIELDS:
+            point[field] += rollup.get(field, 0)
+    return list(series.values())
 
 # ==================== TICKET SYSTEM ====================
 
 ticket_panels_collection = db.ticket_panels
 tickets_collection = db.tickets
+ticket_slots_collection = db.ticket_slots  # Open ticket count per (guild, user), enforces the limit atomically
+
+MAX_OPEN_TICKETS = 3
 
 async def create_ticket_panel(guild_id: str, panel_data: dict) -> dict:
     """Create a ticket panel configuration"""
     import uuid
-    from datetime import datetime, timezone
     
     panel = {
         "id": str(uuid.uuid4()),
@@ -621,7 +1276,7 @@ async def create_ticket_panel(guild_id: str, panel_data: dict) -> dict:
         "ping_roles": panel_data.get("ping_roles", []),  # Roles to ping on new ticket
         "claim_enabled": panel_data.get("claim_enabled", True),
         "transcript_enabled": panel_data.get("transcript_enabled", True),
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "created_at": utcnow(),
         "ticket_counter": 0
     }
     
@@ -636,12 +1291,34 @@ async def get_ticket_panels(guild_id: str) -> list:
     ).to_list(50)
     return panels
 
+TICKET_PANEL_CACHE_TTL = float(os.environ.get('TICKET_PANEL_CACHE_TTL', 60))
+
+_ticket_panel_cache = TTLCache(TICKET_PANEL_CACHE_TTL, maxsize=10000)
+
+def invalidate_ticket_panel(panel_id: str = None):
+    """Drop a cached ticket panel (or all of them)"""
+    if panel_id is None:
+        _ticket_panel_cache.clear()
+    else:
+        _ticket_panel_cache.invalidate(panel_id)
+
 async def get_ticket_panel(panel_id: str) -> dict:
-    """Get a specific ticket panel"""
+    """Get a specific ticket panel.
+
+    The returned dict is shared with the cache - copy before mutating it. The
+    cached ticket_counter can lag, use increment_ticket_counter.
+    """
+    panel = _ticket_panel_cache.get(panel_id)
+    if panel is not None:
+        return panel
+    
+    token = _ticket_panel_cache.token()
     panel = await ticket_panels_collection.find_one(
         {"id": panel_id},
         {"_id": 0}
     )
+    if panel:
+        _ticket_panel_cache.set(panel_id, panel, token=token)
     return panel
 
 async def update_ticket_panel(panel_id: str, updates: dict) -> bool:
@@ -650,11 +1327,13 @@ async def update_ticket_panel(panel_id: str, updates: dict) -> bool:
         {"id": panel_id},
         {"$set": updates}
     )
+    invalidate_ticket_panel(panel_id)
     return result.modified_count > 0
 
 async def delete_ticket_panel(panel_id: str) -> bool:
     """Delete a ticket panel"""
     result = await ticket_panels_collection.delete_one({"id": panel_id})
+    invalidate_ticket_panel(panel_id)
     return result.deleted_count > 0
 
 async def increment_ticket_counter(panel_id: str) -> int:
@@ -669,7 +1348,6 @@ async def increment_ticket_counter(panel_id: str) -> int:
 async def create_ticket(guild_id: str, panel_id: str, ticket_data: dict) -> dict:
     """Create a new ticket"""
     import uuid
-    from datetime import datetime, timezone
     
     ticket = {
         "id": str(uuid.uuid4()),
@@ -686,23 +1364,20 @@ async def create_ticket(guild_id: str, panel_id: str, ticket_data: dict) -> dict
         "closed_by": None,
         "closed_at": None,
         "transcript_url": None,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     
     await tickets_collection.insert_one(ticket)
+    await record_activity(guild_id, tickets_opened=1)
     return {k: v for k, v in ticket.items() if k != "_id"}
 
-async def get_tickets(guild_id: str, status: str = None) -> list:
-    """Get tickets for a guild"""
+async def get_tickets(guild_id: str, status: str = None, after: str = None,
+                      limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """Get one page of tickets for a guild, newest first"""
     query = {"guild_id": guild_id}
     if status:
         query["status"] = status
-    
-    tickets = await tickets_collection.find(
-        query,
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    return tickets
+    return await find_page(tickets_collection, query, after, limit, descending=True)
 
 async def get_ticket(ticket_id: str) -> dict:
     """Get a specific ticket"""
@@ -730,42 +1405,117 @@ async def update_ticket(ticket_id: str, updates: dict) -> bool:
 
 async def claim_ticket(ticket_id: str, user_id: str) -> bool:
     """Claim a ticket"""
-    from datetime import datetime, timezone
     result = await tickets_collection.update_one(
         {"id": ticket_id, "status": "open"},
         {"$set": {
             "claimed_by": user_id,
-            "claimed_at": datetime.now(timezone.utc).isoformat(),
+            "claimed_at": utcnow(),
             "status": "claimed"
         }}
     )
     return result.modified_count > 0
 
 async def close_ticket(ticket_id: str, user_id: str) -> bool:
-    """Close a ticket"""
-    from datetime import datetime, timezone
-    result = await tickets_collection.update_one(
-        {"id": ticket_id},
+    """Close a ticket and free its owner's ticket slot"""
+    ticket = await tickets_collection.find_one_and_update(
+        {"id": ticket_id, "status": {"$ne": "closed"}},
         {"$set": {
             "closed_by": user_id,
-            "closed_at": datetime.now(timezone.utc).isoformat(),
+            "closed_at": utcnow(),
             "status": "closed"
-        }}
+        }},
+        projection={"_id": 0, "guild_id": 1, "user_id": 1}
+    )
+    if not ticket:
+        return False
+    await release_ticket_slot(ticket["guild_id"], ticket["user_id"])
+    await record_activity(ticket["guild_id"], tickets_closed=1)
+    return True
+
+async def count_open_tickets(guild_id: str, user_id: str) -> int:
+    """Count a user's open or claimed tickets (covered by the guild/user/status index)"""
+    return await tickets_collection.count_documents({
+        "guild_id": guild_id,
+        "user_id": user_id,
+        "status": {"$in": ["open", "claimed"]}
+    })
+
+async def get_open_ticket_slots(guild_id: str, user_id: str) -> int:
+    """Number of ticket slots a user currently holds"""
+    slot = await ticket_slots_collection.find_one({"guild_id": guild_id, "user_id": user_id}, {"_id": 0, "open": 1})
+    return slot["open"] if slot else 0
+
+TICKET_SLOT_RECOUNT_AFTER = timedelta(minutes=5)
+
+async def reserve_ticket_slot(guild_id: str, user_id: str, limit: int = MAX_OPEN_TICKETS) -> bool:
+    """Atomically take one of the user's open-ticket slots.
+
+    The conditional $inc can't overshoot the limit under concurrent clicks:
+    when the user is at the limit the filter doesn't match and the upsert hits
+    the unique index. Release the slot again if the ticket isn't created.
+    """
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+    
+    key = {"guild_id": guild_id, "user_id": user_id}
+    for attempt in range(2):
+        now = utcnow()
+        try:
+            slot = await ticket_slots_collection.find_one_and_update(
+                {**key, "open": {"$lt": limit}},
+                {"$inc": {"open": 1}, "$set": {"reserved_at": now}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            if attempt:
+                return False
+            # At the limit. If no reservation is in flight, recount in case a
+            # ticket went away without close_ticket (or a creation crashed).
+            result = await ticket_slots_collection.update_one(
+                {**key, "reserved_at": {"$lt": now - TICKET_SLOT_RECOUNT_AFTER}},
+                {"$set": {"open": await count_open_tickets(guild_id, user_id)}}
+            )
+            if not result.modified_count:
+                return False
+            continue
+        
+        if slot["open"] == 1:
+            # First slot: make sure tickets from before the counter existed are counted
+            existing = await count_open_tickets(guild_id, user_id)
+            if existing:
+                slot = await ticket_slots_collection.find_one_and_update(
+                    key,
+                    {"$max": {"open": existing + 1}},
+                    return_document=ReturnDocument.AFTER
+                )
+                if slot["open"] > limit:
+                    await release_ticket_slot(guild_id, user_id)
+                    return False
+        return True
+    return False
+
+async def release_ticket_slot(guild_id: str, user_id: str):
+    """Give back an open-ticket slot"""
+    await ticket_slots_collection.update_one(
+        {"guild_id": guild_id, "user_id": user_id, "open": {"$gt": 0}},
+        {"$inc": {"open": -1}}
     )
-    return result.modified_count > 0
 
 async def get_ticket_stats(guild_id: str) -> dict:
-    """Get ticket statistics"""
-    open_count = await tickets_collection.count_documents({"guild_id": guild_id, "status": "open"})
-    claimed_count = await tickets_collection.count_documents({"guild_id": guild_id, "status": "claimed"})
-    closed_count = await tickets_collection.count_documents({"guild_id": guild_id, "status": "closed"})
-    total_count = await tickets_collection.count_documents({"guild_id": guild_id})
+    """Get ticket statistics (one aggregation, grouped by status)"""
+    counts = {}
+    async for row in tickets_collection.aggregate([
+        {"$match": {"guild_id": guild_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]):
+        counts[row["_id"]] = row["count"]
     
     return {
-        "open": open_count,
-        "claimed": claimed_count,
-        "closed": closed_count,
-        "total": total_count
+        "open": counts.get("open", 0),
+        "claimed": counts.get("claimed", 0),
+        "closed": counts.get("closed", 0),
+        "total": sum(counts.values())
     }
 
 # ==================== MULTI TEMP VOICE CREATORS ====================
@@ -799,6 +1549,7 @@ async def create_temp_creator(guild_id: str, creator_data: dict) -> dict:
     }
     
     await temp_creators_collection.insert_one(creator)
+    temp_creator_registry.put(creator)
     return {k: v for k, v in creator.items() if k != "_id"}
 
 async def get_temp_creators(guild_id: str) -> list:
@@ -818,7 +1569,12 @@ async def get_temp_creator(creator_id: str) -> dict:
     return creator
 
 async def get_temp_creator_by_channel(channel_id: str) -> dict:
-    """Get temp creator by channel ID"""
+    """Get temp creator by channel ID, from memory once the registry is loaded.
+
+    The cached channel_counter can lag, use increment_temp_creator_counter.
+    """
+    if temp_creator_registry.loaded:
+        return temp_creator_registry.get(channel_id)
     creator = await temp_creators_collection.find_one(
         {"channel_id": channel_id},
         {"_id": 0}
@@ -831,12 +1587,19 @@ async def update_temp_creator(creator_id: str, updates: dict) -> bool:
         {"id": creator_id},
         {"$set": updates}
     )
+    if result.modified_count > 0:
+        creator = await temp_creators_collection.find_one({"id": creator_id})
+        if creator:
+            temp_creator_registry.put(creator)
     return result.modified_count > 0
 
 async def delete_temp_creator(creator_id: str) -> bool:
     """Delete a temp creator"""
-    result = await temp_creators_collection.delete_one({"id": creator_id})
-    return result.deleted_count > 0
+    result = await temp_creators_collection.find_one_and_delete({"id": creator_id}, {"_id": 1})
+    if not result:
+        return False
+    temp_creator_registry.remove(result["_id"])
+    return True
 
 async def increment_temp_creator_counter(creator_id: str) -> int:
     """Increment and return the channel counter"""
@@ -879,18 +1642,23 @@ def get_numbering(number: int, numbering_type: str) -> str:
 
 # ==================== PENDING ACTIONS ====================
 
+PENDING_ACTION_TTL = timedelta(hours=1)
+# A claimed action whose worker died is handed out again after this long
+PENDING_ACTION_CLAIM_TIMEOUT = timedelta(minutes=5)
+
 async def add_pending_action(action_type: str, guild_id: str, data: dict) -> str:
     """Add a pending action for the bot to execute"""
-    from datetime import datetime, timezone
     import uuid
     
+    now = utcnow()
     action = {
         "id": str(uuid.uuid4()),
         "type": action_type,
         "guild_id": guild_id,
         "data": data,
         "status": "pending",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now,
+        "expires_at": now + PENDING_ACTION_TTL  # Removed by the TTL index
     }
     await pending_actions_collection.insert_one(action)
     return action["id"]
@@ -902,6 +1670,37 @@ async def get_pending_actions() -> list:
     ).to_list(100)
     return [{k: v for k, v in a.items() if k != "_id"} for a in actions]
 
+async def claim_pending_action(worker_id: str) -> dict:
+    """Atomically claim the oldest pending action.
+
+    find_one_and_update flips the status to "processing", so several bot
+    processes never execute the same action. Actions stuck in "processing"
+    longer than PENDING_ACTION_CLAIM_TIMEOUT are claimed again.
+    """
+    from pymongo import ReturnDocument
+    
+    now = utcnow()
+    action = await pending_actions_collection.find_one_and_update(
+        {"$or": [
+            {"status": "pending"},
+            {"status": "processing", "claimed_at": {"$lt": now - PENDING_ACTION_CLAIM_TIMEOUT}}
+        ]},
+        {"$set": {"status": "processing", "claimed_at": now, "claimed_by": worker_id}},
+        sort=[("created_at", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    return action
+
+async def renew_action_claim(action_id: str, worker_id: str) -> bool:
+    """Refresh claimed_at of an action this worker holds. Returns False if the
+    claim was lost, i.e. another worker reclaimed the action after a timeout."""
+    result = await pending_actions_collection.update_one(
+        {"id": action_id, "status": "processing", "claimed_by": worker_id},
+        {"$set": {"claimed_at": utcnow()}}
+    )
+    return result.matched_count > 0
+
 async def mark_action_complete(action_id: str) -> bool:
     """Mark an action as complete"""
     result = await pending_actions_collection.update_one(
@@ -910,12 +1709,320 @@ async def mark_action_complete(action_id: str) -> bool:
     )
     return result.modified_count > 0
 
+async def mark_action_failed(action_id: str, error: str) -> bool:
+    """Mark an action as failed after its last retry"""
+    result = await pending_actions_collection.update_one(
+        {"id": action_id},
+        {"$set": {"status": "failed", "error": error}}
+    )
+    return result.modified_count > 0
+
+async def get_pending_action_counts() -> dict:
+    """Count actions per status"""
+    result = await pending_actions_collection.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    return {r["_id"]: r["count"] for r in result}
+
 async def delete_old_actions() -> int:
     """Delete actions older than 1 hour"""
-    from datetime import datetime, timezone, timedelta
-    cutoff = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    cutoff = utcnow() - timedelta(hours=1)
     result = await pending_actions_collection.delete_many(
         {"created_at": {"$lt": cutoff}}
     )
     return result.deleted_count
 
+# ==================== DASHBOARD USERS ====================
+
+dashboard_users_collection = db.dashboard_users
+
+async def get_dashboard_users(after: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """Get one page of dashboard accounts, without password hashes"""
+    return await find_page(dashboard_users_collection, {}, after, limit, projection={"password_hash": 0})
+
+# ==================== SYSTEM STATE ====================
+
+system_state_collection = db.system_state  # Metrics and bookkeeping shared between bot and API
+
+async def get_system_state(key: str) -> dict:
+    """Get a system state entry"""
+    state = await system_state_collection.find_one({"key": key}, {"_id": 0})
+    return state
+
+async def set_system_state(key: str, data: dict) -> dict:
+    """Store a system state entry"""
+    state = {"key": key, "data": data, "updated_at": utcnow()}
+    await system_state_collection.update_one({"key": key}, {"$set": state}, upsert=True)
+    return state
+
+# ==================== MIGRATIONS ====================
+
+# Fields that were stored as ISO 8601 strings before timestamps became BSON dates
+DATETIME_FIELDS = {
+    "users": ["last_xp"],
+    "warnings": ["timestamp"],
+    "custom_commands": ["created_at"],
+    "news": ["created_at", "scheduled_for", "posted_at"],
+    "mod_logs": ["timestamp"],
+    "temp_channels": ["created_at"],
+    "reaction_roles": ["created_at"],
+    "games": ["created_at"],
+    "server_data": ["last_sync"],
+    "voice_sessions": ["started_at", "ended_at"],
+    "ticket_panels": ["created_at"],
+    "tickets": ["created_at", "claimed_at", "closed_at"],
+    "pending_actions": ["created_at"],
+    "system_state": ["updated_at"],
+    "dashboard_users": ["created_at"],
+}
+DATETIME_MIGRATION_VERSION = 1
+
+async def migrate_datetimes(batch_size: int = 1000) -> dict:
+    """Convert ISO string timestamps to BSON dates.
+
+    Runs once per database; the result is stored in system_state
+    "datetime_migration". Only string values are touched, so concurrent runs
+    (bot and API starting together) are harmless. Unparsable strings are
+    logged and left as they are.
+    """
+    from pymongo import UpdateOne
+    
+    state = await get_system_state("datetime_migration")
+    if state and state.get("data", {}).get("version", 0) >= DATETIME_MIGRATION_VERSION:
+        return state["data"]
+    
+    converted = {}
+    for collection_name, fields in DATETIME_FIELDS.items():
+        collection = db[collection_name]
+        count = 0
+        ops = []
+        async for doc in collection.find(
+            {"$or": [{field: {"$type": "string"}} for field in fields]},
+            {field: 1 for field in fields}
+        ):
+            update = {}
+            for field in fields:
+                if not isinstance(doc.get(field), str):
+                    continue
+                try:
+                    update[field] = as_datetime(doc[field])
+                except ValueError:
+                    logger.warning(f"Not a timestamp: {collection_name}.{field} = {doc[field]!r}")
+            if update:
+                # Match the old values so concurrent writes aren't overwritten
+                ops.append(UpdateOne({"_id": doc["_id"], **{f: doc[f] for f in update}}, {"$set": update}))
+            if len(ops) >= batch_size:
+                count += (await collection.bulk_write(ops, ordered=False)).modified_count
+                ops = []
+        if ops:
+            count += (await collection.bulk_write(ops, ordered=False)).modified_count
+        converted[collection_name] = count
+    
+    data = {"version": DATETIME_MIGRATION_VERSION, "converted": converted}
+    await set_system_state("datetime_migration", data)
+    logger.info(f"Converted {sum(converted.values())} string timestamps to dates")
+    return data
+
+# ==================== INDEXES ====================
+
+# (collection, keys, options) for every query shape used in this module and in
+# server.py. Keep in sync when adding new queries.
+INDEXES = [
+    ("guilds", [("guild_id", 1)], {"unique": True}),
+    ("users", [("guild_id", 1), ("user_id", 1)], {"unique": True}),
+    ("users", [("guild_id", 1), ("xp", -1)], {}),
+    ("user_profiles", [("guild_id", 1), ("user_id", 1)], {"unique": True}),
+    ("user_profiles", [("updated_at", 1)], {"expireAfterSeconds": USER_PROFILE_EXPIRE_DAYS * 86400}),
+    ("warnings", [("guild_id", 1), ("user_id", 1), ("_id", 1)], {}),
+    ("warnings", [("guild_id", 1), ("_id", 1)], {}),
+    ("custom_commands", [("guild_id", 1), ("name", 1)], {"unique": True}),
+    ("news", [("id", 1)], {"unique": True}),
+    ("news", [("guild_id", 1), ("created_at", -1)], {}),
+    ("news", [("guild_id", 1), ("_id", -1)], {}),
+    ("news", [("due_at", 1)], {"partialFilterExpression": {"due_at": {"$exists": True}}}),
+    ("mod_logs", [("guild_id", 1), ("timestamp", -1)], {}),
+    ("mod_logs", [("guild_id", 1), ("_id", -1)], {}),
+    ("temp_channels", [("channel_id", 1)], {"unique": True}),
+    ("temp_channels", [("guild_id", 1)], {}),
+    ("reaction_roles", [("id", 1)], {}),
+    ("reaction_roles", [("message_id", 1), ("emoji", 1)], {}),
+    ("reaction_roles", [("guild_id", 1), ("_id", 1)], {}),
+    ("games", [("id", 1)], {"unique": True}),
+    ("games", [("guild_id", 1), ("status", 1)], {}),
+    ("server_data", [("guild_id", 1)], {"unique": True}),
+    ("level_rewards", [("id", 1)], {"unique": True}),
+    ("level_rewards", [("guild_id", 1), ("level", 1)], {}),
+    ("voice_sessions", [("id", 1)], {"unique": True, "partialFilterExpression": {"id": {"$exists": True}}}),
+    ("voice_sessions", [("guild_id", 1), ("ended_at", 1)], {}),
+    ("voice_presence", [("id", 1)], {"unique": True}),
+    ("activity_rollups", [("guild_id", 1), ("bucket", 1)], {"unique": True}),
+    ("voice_presence", [("guild_id", 1), ("_id", 1)], {}),
+    ("ticket_panels", [("id", 1)], {"unique": True}),
+    ("ticket_panels", [("guild_id", 1)], {}),
+    ("tickets", [("id", 1)], {"unique": True}),
+    ("tickets", [("channel_id", 1)], {}),
+    ("tickets", [("guild_id", 1), ("status", 1), ("created_at", -1)], {}),
+    ("tickets", [("guild_id", 1), ("user_id", 1), ("status", 1)], {}),
+    ("tickets", [("guild_id", 1), ("_id", -1)], {}),
+    ("tickets", [("guild_id", 1), ("status", 1), ("_id", -1)], {}),
+    ("ticket_slots", [("guild_id", 1), ("user_id", 1)], {"unique": True}),
+    ("temp_creators", [("id", 1)], {"unique": True}),
+    ("temp_creators", [("channel_id", 1)], {}),
+    ("temp_creators", [("guild_id", 1)], {}),
+    ("pending_actions", [("id", 1)], {"unique": True}),
+    ("pending_actions", [("status", 1), ("created_at", 1)], {}),
+    ("pending_actions", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ("system_state", [("key", 1)], {"unique": True}),
+    ("dashboard_users", [("id", 1)], {"unique": True}),
+    ("dashboard_users", [("email", 1)], {"unique": True}),
+    ("dashboard_users", [("username", 1)], {"unique": True}),
+]
+
+async def ensure_indexes() -> dict:
+    """Create missing indexes. Safe to run on every startup.
+
+    Returns the index specs grouped into "created", "existing" and "failed"
+    (e.g. a unique index over data that already contains duplicates).
+    """
+    report = {"created": [], "existing": [], "failed": []}
+    existing_keys = {}
+    
+    for collection_name, keys, options in INDEXES:
+        label = f"{collection_name}({', '.join(f'{k}:{d}' for k, d in keys)})"
+        if collection_name not in existing_keys:
+            info = await db[collection_name].index_information()
+            existing_keys[collection_name] = [
+                [(k, int(d) if isinstance(d, (int, float)) else d) for k, d in i["key"]]
+                for i in info.values()
+            ]
+        
+        if keys in existing_keys[collection_name]:
+            report["existing"].append(label)
+            continue
+        
+        try:
+            await db[collection_name].create_index(keys, **options)
+            report["created"].append(label)
+        except Exception as e:
+            logger.error(f"Could not create index {label}: {e}")
+            report["failed"].append(label)
+    
+    logger.info(
+        f"Indexes: {len(report['created'])} created, {len(report['existing'])} existing, "
+        f"{len(report['failed'])} failed"
+    )
+    for label in report["created"]:
+        logger.info(f"Created index {label}")
+    return report
+
+# ==================== CACHE INVALIDATION ====================
+
+_change_listeners = {}  # collection name -> [callback(change)]
+
+def on_collection_change(collection_name: str, callback):
+    """Register a cache invalidator for change stream events on a collection.
+
+    The callback receives the change event, or None when events may have been
+    missed (stream (re)started) and everything cached should be dropped.
+    """
+    _change_listeners.setdefault(collection_name, []).append(callback)
+
+def _dispatch_change(collection_name: str, change):
+    for callback in _change_listeners.get(collection_name, []):
+        try:
+            callback(change)
+        except Exception as e:
+            logger.error(f"Cache invalidation error for {collection_name}: {e}")
+
+_change_streams_active = False
+
+def change_streams_active() -> bool:
+    """Whether watch_collection_changes currently has an open change stream"""
+    return _change_streams_active
+
+async def watch_collection_changes():
+    """Feed change stream events into the registered cache invalidators.
+
+    Change streams need a replica set. On a standalone server this logs once and
+    returns; the caches then rely on their TTL alone.
+    """
+    global _change_streams_active
+    from pymongo.errors import OperationFailure, PyMongoError
+    
+    while True:
+        pipeline = [{"$match": {"ns.coll": {"$in": list(_change_listeners)}}}]
+        try:
+            async with db.watch(pipeline, full_document="updateLookup") as stream:
+                _change_streams_active = True
+                # Anything cached before the stream was open may be stale
+                for collection_name in list(_change_listeners):
+                    _dispatch_change(collection_name, None)
+                async for change in stream:
+                    _dispatch_change(change["ns"]["coll"], change)
+        except OperationFailure as e:
+            _change_streams_active = False
+            logger.warning(f"Change streams unavailable, caches fall back to TTL: {e}")
+            return
+        except PyMongoError as e:
+            _change_streams_active = False
+            logger.error(f"Change stream error, reconnecting: {e}")
+            await asyncio.sleep(5)
+
+def _on_guild_change(change):
+    document = (change or {}).get("fullDocument")
+    if document and document.get("guild_id"):
+        invalidate_guild_config(document["guild_id"])
+    else:
+        invalidate_guild_config()
+
+on_collection_change("guilds", _on_guild_change)
+
+def _on_custom_command_change(change):
+    # Deletes only carry the _id, so they drop every guild's index
+    document = (change or {}).get("fullDocument")
+    if document and document.get("guild_id"):
+        invalidate_custom_commands(document["guild_id"])
+    else:
+        invalidate_custom_commands()
+
+on_collection_change("custom_commands", _on_custom_command_change)
+
+def _on_ticket_panel_change(change):
+    if change and change["operationType"] == "update":
+        fields = change.get("updateDescription", {}).get("updatedFields", {})
+        if set(fields) == {"ticket_counter"}:
+            return  # Counter bumps from ticket creation don't affect the cached panel
+    document = (change or {}).get("fullDocument")
+    if document and document.get("id"):
+        invalidate_ticket_panel(document["id"])
+    else:
+        invalidate_ticket_panel()
+
+on_collection_change("ticket_panels", _on_ticket_panel_change)
+
+def _on_reaction_role_change(change):
+    if not reaction_role_index.loaded:
+        return  # Only processes that loaded the routing table keep it current
+    if change is None:
+        asyncio.get_running_loop().create_task(load_reaction_role_index())
+    elif change["operationType"] == "delete":
+        reaction_role_index.remove(change["documentKey"]["_id"])
+    elif change.get("fullDocument"):
+        reaction_role_index.put(change["fullDocument"])
+
+on_collection_change("reaction_roles", _on_reaction_role_change)
+
+def _registry_change_handler(registry: ChannelRegistry):
+    def handler(change):
+        if not registry.loaded:
+            return
+        if change is None:
+            asyncio.get_running_loop().create_task(load_temp_channel_registries())
+        elif change["operationType"] == "delete":
+            registry.remove(change["documentKey"]["_id"])
+        elif change.get("fullDocument"):
+            registry.put(change["fullDocument"])
+    return handler
+
+on_collection_change("temp_channels", _registry_change_handler(temp_channel_registry))
+on_collection_change("temp_creators", _registry_change_handler(temp_creator_registry))
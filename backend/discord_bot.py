@@ -2,11 +2,18 @@ import discord
 from discord import app_commands, ui
 from discord.ext import commands, tasks
 import asyncio
+import collections
+import hashlib
+import json
 import os
 import logging
 import random
+import socket
+import time
+import uuid
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
+from pymongo.errors import BulkWriteError
 from pathlib import Path
 
 # Load environment
@@ -14,26 +21,82 @@ ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 from database import (
-    get_guild_config, update_guild_config, get_user_data, update_user_data,
+    get_guild_config, update_guild_config, get_user_data,
     add_warning, get_warnings, clear_warnings, get_leaderboard,
-    get_custom_commands, add_mod_log, get_news, mark_news_posted,
-    create_temp_channel, get_temp_channel, get_temp_channels, update_temp_channel, delete_temp_channel,
-    get_reaction_roles, get_reaction_role_by_message, create_reaction_role, delete_reaction_role,
+    get_custom_command_response, add_mod_log, mark_news_posted, claim_due_news, get_upcoming_news,
+    backfill_news_due_times,
+    create_temp_channel, get_temp_channel, get_temp_channels, is_temp_channel, update_temp_channel, delete_temp_channel,
+    get_reaction_roles, get_reaction_role_ids, create_reaction_role, delete_reaction_role,
     create_game, get_game, update_game, get_active_games,
     get_level_rewards, get_server_data,
     get_ticket_panels, get_ticket_panel, create_ticket, get_ticket_by_channel, 
-    claim_ticket, close_ticket, increment_ticket_counter
+    claim_ticket, close_ticket, increment_ticket_counter,
+    MAX_OPEN_TICKETS, get_open_ticket_slots, reserve_ticket_slot, release_ticket_slot
 )
-from database import db  # Import db for direct queries
+from database import watch_collection_changes, ensure_indexes, on_collection_change, change_streams_active
+from database import migrate_datetimes, utcnow
+from database import insert_voice_sessions, sync_voice_presence, load_open_voice_sessions
+from database import activity_bucket, apply_activity_increments
+from mongo import pool_stats
+from database import apply_user_increments, write_user_increments, read_user_levels
+from database import promote_user_level, get_user_rank
+from database import load_reaction_role_index, load_temp_channel_registries
+from database import save_user_profiles, get_user_profiles
+from leveling import calculate_level, xp_for_level, level_curve_for_config
+from cache import TTLCache
 from translations import t
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('discord_bot')
 
+class MultiBot(commands.Bot):
+    async def setup_hook(self):
+        try:
+            await ensure_indexes()
+        except Exception as e:
+            logger.error(f'Index bootstrap failed: {e}')
+        try:
+            await migrate_datetimes()
+        except Exception as e:
+            logger.error(f'Datetime migration failed: {e}')
+        
+        try:
+            routes = await load_reaction_role_index()
+            logger.info(f'Loaded {routes} reaction role routes')
+        except Exception as e:
+            logger.error(f'Error loading reaction roles: {e}')
+        try:
+            await load_temp_channel_registries()
+        except Exception as e:
+            logger.error(f'Error loading temp channels: {e}')
+        
+        # Keep cached guild configs in sync with dashboard edits
+        self.cache_watcher = asyncio.create_task(watch_collection_changes())
+        level_reward_worker.start()
+        
+        # Buttons on panels sent before a restart are routed by their custom_id
+        self.add_dynamic_items(RoleButton, ReactionRoleButton, TicketPanelButton, TicketClaimButton, TicketCloseButton)
+    
+    async def close(self):
+        # Don't lose buffered message XP on shutdown
+        try:
+            await flush_message_xp()
+        except Exception as e:
+            logger.error(f'Error flushing XP on shutdown: {e}')
+        try:
+            await voice_ledger.flush()
+        except Exception as e:
+            logger.error(f'Error flushing voice sessions on shutdown: {e}')
+        try:
+            await activity_counter.flush()
+        except Exception as e:
+            logger.error(f'Error flushing activity on shutdown: {e}')
+        await super().close()
+
 # Bot setup with all intents
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = MultiBot(command_prefix="!", intents=intents)
 
 # ==================== AI INTEGRATION (DISABLED) ====================
 # AI features temporarily disabled - can be enabled later
@@ -44,21 +107,296 @@ async def get_ai_response(message: str, system_prompt: str) -> str:
 
 # ==================== HELPER FUNCTIONS ====================
 
-def calculate_level(xp: int) -> int:
-    level = 0
-    required = 100
-    total = 0
-    while total + required <= xp:
-        total += required
-        level += 1
-        required = int(100 * (1.1 ** level))
-    return level
-
-def xp_for_level(level: int) -> int:
-    total = 0
-    for i in range(level):
-        total += int(100 * (1.1 ** i))
-    return total
+XP_FLUSH_INTERVAL = float(os.environ.get('XP_FLUSH_INTERVAL', 5))
+
+class XPAccumulator:
+    """Buffers message XP in memory and writes it in batches.
+
+    The cooldown is enforced locally, so a qualifying message costs no database
+    round-trip. flush() applies all buffered deltas with one atomic bulk $inc.
+    """
+    def __init__(self):
+        self.pending = {}  # (guild_id, user_id) -> {"xp": int, "messages": int}
+        self.last_xp = {}  # (guild_id, user_id) -> datetime of the last award
+        self.channels = {}  # (guild_id, user_id) -> channel of the last award, for level-up messages
+        self.cooldown_until = {}  # (guild_id, user_id) -> time.monotonic() deadline
+    
+    def award(self, guild_id: str, user_id: str, xp: int, cooldown: float, channel_id: int) -> bool:
+        """Buffer XP for a message. Returns False while the user is on cooldown."""
+        key = (guild_id, user_id)
+        now = time.monotonic()
+        if self.cooldown_until.get(key, 0) > now:
+            return False
+        
+        self.cooldown_until[key] = now + cooldown
+        entry = self.pending.setdefault(key, {"xp": 0, "messages": 0})
+        entry["xp"] += xp
+        entry["messages"] += 1
+        self.last_xp[key] = utcnow()
+        self.channels[key] = channel_id
+        return True
+    
+    def pending_xp(self, guild_id: str, user_id: str) -> int:
+        return self.pending.get((guild_id, user_id), {}).get("xp", 0)
+    
+    async def flush(self) -> list:
+        """Write buffered XP. Returns (user_doc, channel_id) for every flushed user."""
+        now = time.monotonic()
+        self.cooldown_until = {k: v for k, v in self.cooldown_until.items() if v > now}
+        if not self.pending:
+            return []
+        
+        pending, self.pending = self.pending, {}
+        last_xp = {key: self.last_xp.pop(key) for key in pending}
+        channels = {key: self.channels.pop(key, None) for key in pending}
+        keys = list(pending)
+        try:
+            await write_user_increments(
+                pending,
+                {key: {"last_xp": when} for key, when in last_xp.items()}
+            )
+        except BulkWriteError as e:
+            # The write is unordered: everything except the listed operations
+            # is stored, so only those deltas may be applied again
+            failed = {keys[error["index"]] for error in e.details.get("writeErrors", [])}
+            self._requeue({key: pending[key] for key in failed}, last_xp, channels)
+            logger.error(f"XP flush: {len(failed)} of {len(keys)} updates failed, retrying them next flush")
+            keys = [key for key in keys if key not in failed]
+        except Exception:
+            # Keep the deltas for the next flush
+            self._requeue(pending, last_xp, channels)
+            raise
+        
+        # Deltas are stored at this point; a failing read-back only skips level-up checks
+        docs = await read_user_levels(keys)
+        return [(doc, channels.get((doc['guild_id'], doc['user_id']))) for doc in docs]
+    
+    def _requeue(self, pending: dict, last_xp: dict, channels: dict):
+        for key, inc in pending.items():
+            entry = self.pending.setdefault(key, {"xp": 0, "messages": 0})
+            entry["xp"] += inc["xp"]
+            entry["messages"] += inc["messages"]
+            self.last_xp.setdefault(key, last_xp[key])
+            self.channels.setdefault(key, channels[key])
+
+xp_accumulator = XPAccumulator()
+
+USER_PROFILE_REFRESH = float(os.environ.get('USER_PROFILE_REFRESH', 6 * 3600))
+
+class MemberNames:
+    """Resolves user ids to display names for whole lists at once.
+
+    Cached members are read from the gateway cache; the rest come from the
+    user_profiles collection with a single query. Profiles of members seen here
+    are written back when they changed or are older than USER_PROFILE_REFRESH,
+    so the dashboard API can show names too.
+    """
+    def __init__(self, refresh: float):
+        self.saved = TTLCache(refresh, maxsize=100000)  # (guild_id, user_id) -> saved profile
+    
+    @staticmethod
+    def profile(member: discord.Member) -> dict:
+        return {
+            "user_id": str(member.id),
+            "name": member.name,
+            "display_name": member.display_name,
+            "avatar_url": member.display_avatar.url
+        }
+    
+    async def remember(self, guild_id: str, members) -> int:
+        """Store profiles of members that are new, changed or due for a refresh"""
+        changed = []
+        for member in members:
+            profile = self.profile(member)
+            if self.saved.get((guild_id, profile["user_id"])) != profile:
+                changed.append(profile)
+        if not changed:
+            return 0
+        await save_user_profiles(guild_id, changed)
+        for profile in changed:
+            self.saved.set((guild_id, profile["user_id"]), profile)
+        return len(changed)
+    
+    async def resolve(self, guild: discord.Guild, user_ids: list) -> dict:
+        """Map user ids to display names; unknown users are left out"""
+        guild_id = str(guild.id)
+        names = {}
+        members = []
+        missing = []
+        for user_id in user_ids:
+            member = guild.get_member(int(user_id))
+            if member:
+                names[user_id] = member.display_name
+                members.append(member)
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            for user_id, profile in (await get_user_profiles(guild_id, missing)).items():
+                names[user_id] = profile.get("display_name") or profile.get("name")
+        try:
+            await self.remember(guild_id, members)
+        except Exception as e:
+            logger.error(f"Error saving member profiles: {e}")
+        return names
+
+member_names = MemberNames(USER_PROFILE_REFRESH)
+
+VOICE_SESSION_FLUSH_INTERVAL = float(os.environ.get('VOICE_SESSION_FLUSH_INTERVAL', 30))
+
+class VoiceSessionLedger:
+    """Tracks open voice sessions in memory and writes finished ones in batches.
+
+    Joining, leaving and moving only touch memory. flush() appends finished
+    sessions to the ledger with one insert_many and mirrors the open ones to
+    voice_presence, so the dashboard sees them and a restart can resume them.
+    """
+    def __init__(self):
+        self.open = {}  # (guild_id, user_id) -> session
+        self.closed = []  # finished sessions waiting for the next flush
+        self.presence = {}  # session id -> open session, or None once it ended
+        self.restored = False
+    
+    def start(self, guild_id: str, user_id: str, channel_id: str, started_at: datetime = None) -> dict:
+        self.end(guild_id, user_id)
+        session = {
+            "id": str(uuid.uuid4()),
+            "guild_id": guild_id,
+            "user_id": user_id,
+            "channel_id": channel_id,
+            "started_at": started_at or utcnow(),
+            "ended_at": None
+        }
+        self.open[(guild_id, user_id)] = session
+        self.presence[session["id"]] = session
+        return session
+    
+    def end(self, guild_id: str, user_id: str, ended_at: datetime = None) -> dict:
+        session = self.open.pop((guild_id, user_id), None)
+        if session:
+            return self._close(session, ended_at or utcnow())
+        return None
+    
+    def _close(self, session: dict, ended_at: datetime) -> dict:
+        ended_at = max(ended_at, session["started_at"])
+        closed = {
+            **session,
+            "ended_at": ended_at,
+            "duration_minutes": round((ended_at - session["started_at"]).total_seconds() / 60, 2)
+        }
+        self.closed.append(closed)
+        self.presence[session["id"]] = None
+        return closed
+    
+    async def restore(self, guilds) -> dict:
+        """Rebuild open sessions from the current voice states after a start.
+
+        Sessions of members still in the same channel are resumed with their
+        original start time. The others are closed at the last flush before
+        the restart, the latest time they are known to have been there.
+        """
+        from database import get_system_state
+        
+        previous = {(s["guild_id"], s["user_id"]): s for s in await load_open_voice_sessions()}
+        state = await get_system_state("voice_presence")
+        last_seen = state["updated_at"] if state else utcnow()
+        
+        resumed = started = 0
+        for guild in guilds:
+            guild_id = str(guild.id)
+            config = await get_guild_config(guild_id)
+            if not config.get('voice_xp_enabled'):
+                continue
+            afk_channel_id = config.get('voice_afk_channel')
+            for vc in guild.voice_channels:
+                if afk_channel_id and str(vc.id) == afk_channel_id:
+                    continue
+                for member in vc.members:
+                    if member.bot:
+                        continue
+                    key = (guild_id, str(member.id))
+                    session = previous.pop(key, None)
+                    if key in self.open:
+                        pass  # Joined again after startup, already tracked
+                    elif session and session["channel_id"] == str(vc.id):
+                        self.open[key] = session
+                        self.presence[session["id"]] = session
+                        resumed += 1
+                        continue
+                    else:
+                        self.start(guild_id, str(member.id), str(vc.id))
+                        started += 1
+                    if session:
+                        self._close(session, last_seen)
+        
+        for session in previous.values():
+            self._close(session, last_seen)
+        self.restored = True
+        return {"resumed": resumed, "started": started, "closed": len(self.closed)}
+    
+    async def flush(self):
+        """Write finished sessions and the open-session mirror"""
+        from database import set_system_state
+        
+        closed, self.closed = self.closed, []
+        presence, self.presence = self.presence, {}
+        try:
+            await insert_voice_sessions(closed)
+            await sync_voice_presence(presence)
+        except Exception:
+            # Retry with the next flush, newer changes win
+            self.closed = closed + self.closed
+            for session_id, session in presence.items():
+                self.presence.setdefault(session_id, session)
+            raise
+        # Marks when the open sessions were last confirmed, used by restore()
+        if self.restored:
+            await set_system_state("voice_presence", {"open_sessions": len(self.open)})
+
+voice_ledger = VoiceSessionLedger()
+
+ACTIVITY_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 60))
+
+class ActivityCounter:
+    """Buffers per-guild activity for the hourly rollups.
+
+    Messages, XP and voice minutes are summed in memory per (guild, hour) and
+    flushed with one bulk $inc. Active users are counted once per hour; the
+    users already counted are remembered for the current hour only, so a
+    restart mid-hour can count a user twice.
+    """
+    def __init__(self):
+        self.pending = {}  # (guild_id, bucket) -> {field: amount}
+        self.seen = {}  # (guild_id, bucket) -> user ids counted as active
+    
+    def record(self, guild_id: str, user_id: str = None, **counters):
+        key = (guild_id, activity_bucket())
+        entry = self.pending.setdefault(key, {})
+        for field, amount in counters.items():
+            entry[field] = entry.get(field, 0) + amount
+        if user_id:
+            seen = self.seen.setdefault(key, set())
+            if user_id not in seen:
+                seen.add(user_id)
+                entry["active_users"] = entry.get("active_users", 0) + 1
+    
+    async def flush(self):
+        current = activity_bucket()
+        self.seen = {key: users for key, users in self.seen.items() if key[1] >= current}
+        if not self.pending:
+            return
+        
+        pending, self.pending = self.pending, {}
+        try:
+            await apply_activity_increments(pending)
+        except Exception:
+            for key, counters in pending.items():
+                entry = self.pending.setdefault(key, {})
+                for field, amount in counters.items():
+                    entry[field] = entry.get(field, 0) + amount
+            raise
+
+activity_counter = ActivityCounter()
 
 # ==================== TEMP VOICE CHANNEL VIEWS ====================
 
@@ -177,28 +515,61 @@ class ReactionRoleView(ui.View):
     def __init__(self):
         super().__init__(timeout=None)
 
-class RoleButton(ui.Button):
-    def __init__(self, role_id: int, emoji: str, label: str = None):
-        super().__init__(
+async def toggle_member_role(interaction: discord.Interaction, role_id: int, added: str, removed: str):
+    role = interaction.guild.get_role(role_id)
+    if not role:
+        await interaction.response.send_message("❌ Rolle nicht gefunden!", ephemeral=True)
+        return
+    
+    if role in interaction.user.roles:
+        await interaction.user.remove_roles(role)
+        await interaction.response.send_message(removed.format(role=role.name), ephemeral=True)
+    else:
+        await interaction.user.add_roles(role)
+        await interaction.response.send_message(added.format(role=role.name), ephemeral=True)
+
+class RoleButton(ui.DynamicItem[ui.Button], template=r'role_(?P<role_id>[0-9]+)'):
+    """Role toggle button from /reactionrole, routed by custom_id so it survives restarts"""
+    def __init__(self, role_id: int, emoji: str = None, label: str = None):
+        super().__init__(ui.Button(
             style=discord.ButtonStyle.secondary,
             emoji=emoji,
             label=label,
             custom_id=f"role_{role_id}"
-        )
+        ))
         self.role_id = role_id
     
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(int(match['role_id']))
+    
     async def callback(self, interaction: discord.Interaction):
-        role = interaction.guild.get_role(self.role_id)
-        if not role:
+        await toggle_member_role(interaction, self.role_id, "➕ Rolle **{role}** hinzugefügt!", "➖ Rolle **{role}** entfernt!")
+
+class ReactionRoleButton(ui.DynamicItem[ui.Button], template=r'rr_(?P<rr_id>[0-9a-f-]+)_(?P<role_id>[0-9]+)'):
+    """Button of a dashboard reaction role, routed by custom_id so it survives restarts"""
+    def __init__(self, rr_id: str, role_id: str, emoji: str = None, label: str = None):
+        super().__init__(ui.Button(
+            label=label,
+            emoji=emoji,
+            style=discord.ButtonStyle.primary,
+            custom_id=f"rr_{rr_id}_{role_id}"
+        ))
+        self.rr_id = rr_id
+        self.role_id = role_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(match['rr_id'], match['role_id'])
+    
+    async def callback(self, interaction: discord.Interaction):
+        from database import reaction_role_grants
+        
+        # Buttons of deleted or edited reaction roles stop handing out roles
+        if not await reaction_role_grants(self.rr_id, self.role_id):
             await interaction.response.send_message("❌ Rolle nicht gefunden!", ephemeral=True)
             return
-        
-        if role in interaction.user.roles:
-            await interaction.user.remove_roles(role)
-            await interaction.response.send_message(f"➖ Rolle **{role.name}** entfernt!", ephemeral=True)
-        else:
-            await interaction.user.add_roles(role)
-            await interaction.response.send_message(f"➕ Rolle **{role.name}** hinzugefügt!", ephemeral=True)
+        await toggle_member_role(interaction, int(self.role_id), "✅ Rolle **{role}** erhalten!", "✅ Rolle **{role}** entfernt!")
 
 # ==================== GAME VIEWS ====================
 
@@ -370,24 +741,22 @@ class TicketCreateView(ui.View):
     
     @ui.button(label="Ticket erstellen", style=discord.ButtonStyle.primary, emoji="🎫", custom_id="ticket_create")
     async def create_ticket_btn(self, interaction: discord.Interaction, button: ui.Button):
+        await self.start(interaction)
+    
+    async def start(self, interaction: discord.Interaction):
+        """Check limits, then ask for a category or create the ticket right away"""
         panel = await get_ticket_panel(self.panel_id)
         if not panel:
             await interaction.response.send_message("❌ Ticket-Panel nicht gefunden!", ephemeral=True)
             return
         
-        # Check if user already has an open ticket
-        existing_tickets = await db.tickets.find({
-            "guild_id": str(interaction.guild.id),
-            "user_id": str(interaction.user.id),
-            "status": {"$in": ["open", "claimed"]}
-        }).to_list(100)
-        
-        if len(existing_tickets) >= 3:
-            await interaction.response.send_message("❌ Du hast bereits zu viele offene Tickets!", ephemeral=True)
-            return
-        
         # If panel has categories, show category select first
         if panel.get('categories') and len(panel['categories']) > 0:
+            # Early hint only, the limit is enforced when the ticket is created
+            if await get_open_ticket_slots(str(interaction.guild.id), str(interaction.user.id)) >= MAX_OPEN_TICKETS:
+                await interaction.response.send_message("❌ Du hast bereits zu viele offene Tickets!", ephemeral=True)
+                return
+
             view = TicketCategorySelectView(self.panel_id, panel['categories'])
             await interaction.response.send_message(
                 "📋 **Wähle eine Kategorie für dein Ticket:**",
@@ -400,6 +769,12 @@ class TicketCreateView(ui.View):
         await self.do_create_ticket(interaction, panel, None)
     
     async def do_create_ticket(self, interaction: discord.Interaction, panel: dict, category: str):
+        guild_id = str(interaction.guild.id)
+        user_id = str(interaction.user.id)
+        if not await reserve_ticket_slot(guild_id, user_id):
+            await interaction.response.send_message("❌ Du hast bereits zu viele offene Tickets!", ephemeral=True)
+            return
+        
         # Get ticket number
         ticket_number = await increment_ticket_counter(panel['id'])
         
@@ -442,6 +817,7 @@ class TicketCreateView(ui.View):
                     manage_messages=True
                 )
         
+        created = False
         try:
             channel = await interaction.guild.create_text_channel(
                 name=channel_name,
@@ -457,7 +833,8 @@ class TicketCreateView(ui.View):
                 "ticket_number": ticket_number,
                 "category": category
             }
-            await create_ticket(str(interaction.guild.id), panel['id'], ticket_data)
+            await create_ticket(guild_id, panel['id'], ticket_data)
+            created = True
             
             # Create embed
             embed_color = int(panel.get('color', '#5865F2').replace('#', ''), 16)
@@ -493,9 +870,30 @@ class TicketCreateView(ui.View):
             
         except Exception as e:
             logger.error(f'Error creating ticket: {e}')
+            if not created:
+                await release_ticket_slot(guild_id, user_id)
             await interaction.response.send_message(f"❌ Fehler beim Erstellen des Tickets: {e}", ephemeral=True)
 
 
+class TicketPanelButton(ui.DynamicItem[ui.Button], template=r'(?:ticket_panel|panel_create)_(?P<panel_id>[0-9a-f-]+)'):
+    """Create button on a ticket panel, routed by custom_id so it survives restarts"""
+    def __init__(self, panel_id: str, label: str = None, emoji: str = None, prefix: str = "ticket_panel"):
+        super().__init__(ui.Button(
+            label=label,
+            emoji=emoji,
+            style=discord.ButtonStyle.primary,
+            custom_id=f"{prefix}_{panel_id}"
+        ))
+        self.panel_id = panel_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(match['panel_id'])
+    
+    async def callback(self, interaction: discord.Interaction):
+        await TicketCreateView(self.panel_id).start(interaction)
+
+
 class TicketCategorySelectView(ui.View):
     """View for selecting ticket category"""
     def __init__(self, panel_id: str, categories: list):
@@ -546,16 +944,20 @@ class TicketControlView(ui.View):
         self.add_item(TicketCloseButton(channel_id))
 
 
-class TicketClaimButton(ui.Button):
+class TicketClaimButton(ui.DynamicItem[ui.Button], template=r'ticket_claim_(?P<channel_id>[0-9]+)'):
     def __init__(self, channel_id: str):
-        super().__init__(
+        super().__init__(ui.Button(
             label="Beanspruchen",
             style=discord.ButtonStyle.primary,
             emoji="✋",
             custom_id=f"ticket_claim_{channel_id}"
-        )
+        ))
         self.channel_id = channel_id
     
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(match['channel_id'])
+    
     async def callback(self, interaction: discord.Interaction):
         from database import get_ticket_by_channel, claim_ticket
         
@@ -572,24 +974,28 @@ class TicketClaimButton(ui.Button):
         await claim_ticket(ticket['id'], str(interaction.user.id))
         
         # Update button
-        self.label = f"Beansprucht von {interaction.user.display_name}"
-        self.disabled = True
-        self.style = discord.ButtonStyle.success
+        self.item.label = f"Beansprucht von {interaction.user.display_name}"
+        self.item.disabled = True
+        self.item.style = discord.ButtonStyle.success
         
         await interaction.response.edit_message(view=self.view)
         await interaction.channel.send(f"✋ {interaction.user.mention} hat dieses Ticket beansprucht.")
 
 
-class TicketCloseButton(ui.Button):
+class TicketCloseButton(ui.DynamicItem[ui.Button], template=r'ticket_close_(?P<channel_id>[0-9]+)'):
     def __init__(self, channel_id: str):
-        super().__init__(
+        super().__init__(ui.Button(
             label="Schließen",
             style=discord.ButtonStyle.danger,
             emoji="🔒",
             custom_id=f"ticket_close_{channel_id}"
-        )
+        ))
         self.channel_id = channel_id
     
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(match['channel_id'])
+    
     async def callback(self, interaction: discord.Interaction):
         from database import get_ticket_by_channel, close_ticket
         
@@ -645,59 +1051,202 @@ class TicketCloseConfirmView(ui.View):
 
 # ==================== BOT EVENTS ====================
 
+def serialize_role(role: discord.Role) -> dict:
+    return {
+        "id": str(role.id),
+        "name": role.name,
+        "color": str(role.color),
+        "position": role.position,
+        "mentionable": role.mentionable,
+        "managed": role.managed
+    }
+
+def serialize_channel(channel) -> dict:
+    channel_type = "text" if isinstance(channel, discord.TextChannel) else \
+                   "voice" if isinstance(channel, discord.VoiceChannel) else \
+                   "category" if isinstance(channel, discord.CategoryChannel) else "other"
+    return {
+        "id": str(channel.id),
+        "name": channel.name,
+        "type": channel_type,
+        "category_id": str(channel.category_id) if channel.category_id else None,
+        "position": channel.position
+    }
+
+def serialize_category(category: discord.CategoryChannel) -> dict:
+    return {
+        "id": str(category.id),
+        "name": category.name,
+        "position": category.position
+    }
+
+def serialize_emoji(emoji: discord.Emoji) -> dict:
+    return {
+        "id": str(emoji.id),
+        "name": emoji.name,
+        "animated": emoji.animated,
+        "url": str(emoji.url)
+    }
+
 async def sync_guild_data(guild):
     """Sync all guild data to database for web dashboard"""
     from database import sync_server_data
     
-    # Collect roles
-    roles = []
-    for role in guild.roles:
-        if role.name != "@everyone":
-            roles.append({
-                "id": str(role.id),
-                "name": role.name,
-                "color": str(role.color),
-                "position": role.position,
-                "mentionable": role.mentionable,
-                "managed": role.managed
-            })
-    
-    # Collect channels
-    channels = []
-    for channel in guild.channels:
-        channel_type = "text" if isinstance(channel, discord.TextChannel) else \
-                       "voice" if isinstance(channel, discord.VoiceChannel) else \
-                       "category" if isinstance(channel, discord.CategoryChannel) else "other"
-        channels.append({
-            "id": str(channel.id),
-            "name": channel.name,
-            "type": channel_type,
-            "category_id": str(channel.category_id) if channel.category_id else None,
-            "position": channel.position
-        })
-    
-    # Collect categories
-    categories = []
-    for category in guild.categories:
-        categories.append({
-            "id": str(category.id),
-            "name": category.name,
-            "position": category.position
-        })
-    
-    # Collect emojis
-    emojis = []
-    for emoji in guild.emojis:
-        emojis.append({
-            "id": str(emoji.id),
-            "name": emoji.name,
-            "animated": emoji.animated,
-            "url": str(emoji.url)
-        })
+    roles = [serialize_role(role) for role in guild.roles if role.name != "@everyone"]
+    channels = [serialize_channel(channel) for channel in guild.channels]
+    categories = [serialize_category(category) for category in guild.categories]
+    emojis = [serialize_emoji(emoji) for emoji in guild.emojis]
     
     await sync_server_data(str(guild.id), roles, channels, categories, emojis)
     logger.info(f'Synced data for guild: {guild.name} ({len(roles)} roles, {len(channels)} channels, {len(emojis)} emojis)')
 
+SERVER_SYNC_DEBOUNCE = float(os.environ.get('SERVER_SYNC_DEBOUNCE', 2))
+SERVER_SYNC_BURST_LIMIT = int(os.environ.get('SERVER_SYNC_BURST_LIMIT', 50))
+SERVER_SYNC_RECONCILE_HOURS = float(os.environ.get('SERVER_SYNC_RECONCILE_HOURS', 6))
+
+class ServerDataSyncer:
+    """Collects role/channel/emoji events and writes them as targeted updates.
+
+    Events for a guild are debounced, so a burst (e.g. mass channel creation)
+    ends up in one bulk write. Bursts above the limit fall back to a full sync.
+    """
+    def __init__(self, delay: float, burst_limit: int):
+        self.delay = delay
+        self.burst_limit = burst_limit
+        self.pending = {}  # guild_id -> {(kind, entity_id): entity or None}
+        self.timers = {}  # guild_id -> flush task
+    
+    def queue(self, guild: discord.Guild, kind: str, entity_id: int, entity: dict = None):
+        self.pending.setdefault(guild.id, {})[(kind, str(entity_id))] = entity
+        if guild.id not in self.timers:
+            self.timers[guild.id] = asyncio.create_task(self._flush_later(guild.id))
+    
+    async def _flush_later(self, guild_id: int):
+        from database import apply_server_data_changes
+        
+        await asyncio.sleep(self.delay)
+        del self.timers[guild_id]
+        changes = self.pending.pop(guild_id, {})
+        guild = bot.get_guild(guild_id)
+        if not guild or not changes:
+            return
+        
+        try:
+            if len(changes) > self.burst_limit:
+                await sync_guild_data(guild)
+                return
+            matched = await apply_server_data_changes(
+                str(guild_id),
+                [(kind, entity_id, entity) for (kind, entity_id), entity in changes.items()]
+            )
+            if not matched:
+                await sync_guild_data(guild)
+        except Exception as e:
+            logger.error(f'Error syncing changes for guild {guild.name}: {e}')
+
+server_data_syncer = ServerDataSyncer(SERVER_SYNC_DEBOUNCE, SERVER_SYNC_BURST_LIMIT)
+
+def queue_channel_sync(channel, deleted: bool = False):
+    server_data_syncer.queue(channel.guild, "channels", channel.id, None if deleted else serialize_channel(channel))
+    if isinstance(channel, discord.CategoryChannel):
+        server_data_syncer.queue(channel.guild, "categories", channel.id, None if deleted else serialize_category(channel))
+
+@tasks.loop(hours=SERVER_SYNC_RECONCILE_HOURS)
+async def reconcile_server_data():
+    """Periodic full sync to repair drift from missed or reordered events"""
+    if reconcile_server_data.current_loop == 0:
+        return  # on_ready just did a full sync
+    for guild in bot.guilds:
+        try:
+            await sync_guild_data(guild)
+        except Exception as e:
+            logger.error(f'Error syncing guild {guild.name}: {e}')
+
+STARTUP_SYNC_CONCURRENCY = int(os.environ.get('STARTUP_SYNC_CONCURRENCY', 5))
+
+def command_tree_hash() -> str:
+    """Hash of the application and its slash command payloads, to detect changes between deployments.
+
+    The application id is part of it, so pointing the bot at another
+    application (new token) registers the commands there.
+    """
+    commands = sorted(
+        (cmd.to_dict(bot.tree) for cmd in bot.tree.get_commands()),
+        key=lambda c: (c.get("type", 1), c["name"])
+    )
+    payload = {"application_id": str(bot.application_id), "commands": commands}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+async def sync_command_tree() -> dict:
+    """Sync slash commands, unless the tree is unchanged since the last sync"""
+    from database import get_system_state, set_system_state
+    
+    tree_hash = command_tree_hash()
+    state = await get_system_state("command_tree")
+    if state and state.get("data", {}).get("hash") == tree_hash:
+        logger.info('Slash commands unchanged, skipping sync')
+        return {"skipped": True, "hash": tree_hash}
+    
+    synced = await bot.tree.sync()
+    await set_system_state("command_tree", {
+        "hash": tree_hash, "application_id": str(bot.application_id), "commands": len(synced)
+    })
+    logger.info(f'Synced {len(synced)} slash commands')
+    return {"skipped": False, "hash": tree_hash, "commands": len(synced)}
+
+async def run_startup_sync():
+    """Command and guild data sync, run in the background after login"""
+    from database import set_system_state
+    
+    report = {"started_at": utcnow(), "guilds": len(bot.guilds), "phases": {}}
+    started = time.monotonic()
+    
+    # Resume voice sessions first, the guild sync can take a while
+    phase_start = time.monotonic()
+    try:
+        report["voice_sessions"] = await voice_ledger.restore(bot.guilds)
+    except Exception as e:
+        logger.error(f'Error restoring voice sessions: {e}')
+        report["voice_sessions"] = {"error": str(e)}
+    report["phases"]["voice_restore"] = round(time.monotonic() - phase_start, 3)
+    
+    phase_start = time.monotonic()
+    try:
+        report["commands"] = await sync_command_tree()
+    except Exception as e:
+        logger.error(f'Error syncing commands: {e}')
+        report["commands"] = {"error": str(e)}
+    report["phases"]["command_sync"] = round(time.monotonic() - phase_start, 3)
+    
+    # Sync all guild data, a few guilds at a time
+    phase_start = time.monotonic()
+    semaphore = asyncio.Semaphore(STARTUP_SYNC_CONCURRENCY)
+    failed = 0
+    
+    async def sync_one(guild):
+        nonlocal failed
+        async with semaphore:
+            try:
+                await sync_guild_data(guild)
+            except Exception as e:
+                failed += 1
+                logger.error(f'Error syncing guild {guild.name}: {e}')
+    
+    await asyncio.gather(*(sync_one(guild) for guild in bot.guilds))
+    report["phases"]["guild_sync"] = round(time.monotonic() - phase_start, 3)
+    report["failed_guilds"] = failed
+    report["total"] = round(time.monotonic() - started, 3)
+    
+    logger.info(
+        f'Startup sync finished in {report["total"]}s '
+        f'(commands {report["phases"]["command_sync"]}s, '
+        f'{len(bot.guilds)} guilds {report["phases"]["guild_sync"]}s, {failed} failed)'
+    )
+    try:
+        await set_system_state("startup", report)
+    except Exception as e:
+        logger.error(f'Error storing startup report: {e}')
+
 @bot.event
 async def on_ready():
     logger.info(f'{bot.user} ist online!')
@@ -709,24 +1258,22 @@ async def on_ready():
     except Exception as e:
         logger.error(f'Error setting status: {e}')
     
-    # Sync slash commands
-    try:
-        synced = await bot.tree.sync()
-        logger.info(f'Synced {len(synced)} slash commands')
-    except Exception as e:
-        logger.error(f'Error syncing commands: {e}')
-    
-    # Sync all guild data
-    for guild in bot.guilds:
-        try:
-            await sync_guild_data(guild)
-        except Exception as e:
-            logger.error(f'Error syncing guild {guild.name}: {e}')
+    # Start background tasks right away, they don't depend on the startup sync.
+    # on_ready fires again after reconnects, so only start what isn't running.
+    background_loops = (
+        flush_xp_task, flush_voice_sessions_task, flush_activity_task, voice_xp_task, publish_action_stats,
+        reconcile_server_data, refresh_lookup_tables
+    )
+    for loop in background_loops:
+        if not loop.is_running():
+            loop.start()
+    if not getattr(bot, 'pending_actions_task', None):
+        bot.pending_actions_task = asyncio.create_task(process_pending_actions())
+    if not getattr(bot, 'news_scheduler_task', None):
+        bot.news_scheduler_task = asyncio.create_task(run_news_scheduler())
     
-    # Start background tasks
-    check_scheduled_news.start()
-    voice_xp_task.start()
-    process_pending_actions.start()  # New task for processing API actions
+    if not getattr(bot, 'startup_sync_task', None):
+        bot.startup_sync_task = asyncio.create_task(run_startup_sync())
 
 @bot.event
 async def on_guild_join(guild):
@@ -734,30 +1281,50 @@ async def on_guild_join(guild):
     await sync_guild_data(guild)
     logger.info(f'Joined guild: {guild.name}')
 
-@bot.event
-async def on_guild_update(before, after):
-    """Re-sync when guild is updated"""
-    await sync_guild_data(after)
-
 @bot.event
 async def on_guild_channel_create(channel):
-    """Re-sync when channel is created"""
-    await sync_guild_data(channel.guild)
+    """Sync the new channel"""
+    queue_channel_sync(channel)
 
 @bot.event
 async def on_guild_channel_delete(channel):
-    """Re-sync when channel is deleted"""
-    await sync_guild_data(channel.guild)
+    """Remove the deleted channel"""
+    queue_channel_sync(channel, deleted=True)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    """Sync renamed or moved channels"""
+    if (before.name, before.position, before.category_id) != (after.name, after.position, after.category_id):
+        queue_channel_sync(after)
 
 @bot.event
 async def on_guild_role_create(role):
-    """Re-sync when role is created"""
-    await sync_guild_data(role.guild)
+    """Sync the new role"""
+    server_data_syncer.queue(role.guild, "roles", role.id, serialize_role(role))
 
 @bot.event
 async def on_guild_role_delete(role):
-    """Re-sync when role is deleted"""
-    await sync_guild_data(role.guild)
+    """Remove the deleted role"""
+    server_data_syncer.queue(role.guild, "roles", role.id, None)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    """Sync changed roles"""
+    if serialize_role(before) != serialize_role(after):
+        server_data_syncer.queue(after.guild, "roles", after.id, serialize_role(after))
+
+@bot.event
+async def on_guild_emojis_update(guild, before, after):
+    """Sync added, removed and renamed emojis"""
+    after_ids = {emoji.id for emoji in after}
+    for emoji in before:
+        if emoji.id not in after_ids:
+            server_data_syncer.queue(guild, "emojis", emoji.id, None)
+    before_map = {emoji.id: serialize_emoji(emoji) for emoji in before}
+    for emoji in after:
+        data = serialize_emoji(emoji)
+        if before_map.get(emoji.id) != data:
+            server_data_syncer.queue(guild, "emojis", emoji.id, data)
 
 @bot.event
 async def on_member_join(member):
@@ -834,15 +1401,16 @@ async def on_message(message):
     
     config = await get_guild_config(guild_id)
     lang = config.get('language', 'de')
+    activity_counter.record(guild_id, str(message.author.id), messages=1)
     
     # Custom commands
-    if message.content.startswith(config.get('prefix', '!')):
-        cmd_name = message.content[1:].split()[0].lower()
-        commands_list = await get_custom_commands(guild_id)
-        for cmd in commands_list:
-            if cmd['name'] == cmd_name:
-                await message.channel.send(cmd['response'])
-                return
+    prefix = config.get('prefix', '!')
+    if message.content.startswith(prefix):
+        parts = message.content[len(prefix):].split()
+        response = await get_custom_command_response(guild_id, parts[0]) if parts else None
+        if response is not None:
+            await message.channel.send(response)
+            return
     
     # AI Channel
     if config.get('ai_enabled') and config.get('ai_channel'):
@@ -855,48 +1423,14 @@ async def on_message(message):
                 await message.reply(response)
             return
     
-    # XP System
+    # XP System (buffered, written by flush_xp_task)
     if config.get('leveling_enabled'):
         if str(message.channel.id) in config.get('ignored_channels', []):
             return
         
-        user_data = await get_user_data(guild_id, str(message.author.id))
-        now = datetime.now(timezone.utc)
-        
-        last_xp = user_data.get('last_xp')
-        if last_xp:
-            last_xp_time = datetime.fromisoformat(last_xp)
-            cooldown = config.get('xp_cooldown', 60)
-            if (now - last_xp_time).total_seconds() < cooldown:
-                return
-        
-        xp_gain = config.get('xp_per_message', 15)
-        new_xp = user_data['xp'] + xp_gain
-        old_level = user_data['level']
-        new_level = calculate_level(new_xp)
-        
-        await update_user_data(guild_id, str(message.author.id), {
-            'xp': new_xp,
-            'level': new_level,
-            'messages': user_data['messages'] + 1,
-            'last_xp': now.isoformat()
-        })
-        
-        if new_level > old_level:
-            level_roles = config.get('level_roles', {})
-            if str(new_level) in level_roles:
-                role = message.guild.get_role(int(level_roles[str(new_level)]))
-                if role:
-                    try:
-                        await message.author.add_roles(role)
-                    except:
-                        pass
-            
-            level_channel = message.channel
-            if config.get('level_up_channel'):
-                level_channel = message.guild.get_channel(int(config['level_up_channel'])) or message.channel
-            
-            await level_channel.send(t(lang, 'level_up', user=message.author.mention, level=new_level))
+        xp = config.get('xp_per_message', 15)
+        if xp_accumulator.award(guild_id, str(message.author.id), xp, config.get('xp_cooldown', 60), message.channel.id):
+            activity_counter.record(guild_id, xp=xp)
     
     await bot.process_commands(message)
 
@@ -910,27 +1444,24 @@ async def on_voice_state_update(member, before, after):
     config = await get_guild_config(guild_id)
     
     # ==================== VOICE XP TRACKING ====================
-    from database import start_voice_session, end_voice_session
-    
     if config.get('voice_xp_enabled'):
         afk_channel_id = config.get('voice_afk_channel')
         
+        # User left voice channel (a move ends the old session first)
+        if before.channel and (not after.channel or before.channel.id != after.channel.id):
+            voice_ledger.end(guild_id, str(member.id))
+        
         # User joined a voice channel
         if after.channel and (not before.channel or before.channel.id != after.channel.id):
             # Don't track AFK channel
-            if afk_channel_id and str(after.channel.id) == afk_channel_id:
-                pass
-            else:
-                await start_voice_session(guild_id, str(member.id), str(after.channel.id))
-        
-        # User left voice channel
-        if before.channel and (not after.channel or before.channel.id != after.channel.id):
-            await end_voice_session(guild_id, str(member.id))
+            if not (afk_channel_id and str(after.channel.id) == afk_channel_id):
+                voice_ledger.start(guild_id, str(member.id), str(after.channel.id))
     
     # ==================== MULTI TEMP CHANNEL MANAGEMENT ====================
     from database import get_temp_creators, get_temp_creator_by_channel, increment_temp_creator_counter, get_numbering
     
     # User joined a voice channel - check if it's a creator
+    creator = None
     if after.channel:
         creator = await get_temp_creator_by_channel(str(after.channel.id))
         
@@ -1007,7 +1538,6 @@ async def on_voice_state_update(member, before, after):
     if after.channel and config.get('temp_channels_enabled') and config.get('temp_channel_creator'):
         if str(after.channel.id) == config.get('temp_channel_creator'):
             # Check if we already handled this with multi-creator
-            creator = await get_temp_creator_by_channel(str(after.channel.id))
             if not creator:
                 category = member.guild.get_channel(int(config['temp_channel_category'])) if config.get('temp_channel_category') else after.channel.category
                 
@@ -1041,8 +1571,7 @@ async def on_voice_state_update(member, before, after):
     
     # ==================== DELETE EMPTY TEMP CHANNELS ====================
     if before.channel:
-        temp_channel = await get_temp_channel(str(before.channel.id))
-        if temp_channel:
+        if await is_temp_channel(str(before.channel.id)):
             if len(before.channel.members) == 0:
                 try:
                     await before.channel.delete()
@@ -1057,9 +1586,9 @@ async def on_raw_reaction_add(payload):
     if payload.member.bot:
         return
     
-    rrs = await get_reaction_role_by_message(str(payload.message_id), str(payload.emoji))
-    for rr in rrs:
-        role = payload.member.guild.get_role(int(rr['role_id']))
+    role_ids = await get_reaction_role_ids(str(payload.message_id), str(payload.emoji))
+    for role_id in role_ids:
+        role = payload.member.guild.get_role(int(role_id))
         if role:
             try:
                 await payload.member.add_roles(role)
@@ -1077,15 +1606,28 @@ async def on_raw_reaction_remove(payload):
     if not member or member.bot:
         return
     
-    rrs = await get_reaction_role_by_message(str(payload.message_id), str(payload.emoji))
-    for rr in rrs:
-        role = guild.get_role(int(rr['role_id']))
+    role_ids = await get_reaction_role_ids(str(payload.message_id), str(payload.emoji))
+    for role_id in role_ids:
+        role = guild.get_role(int(role_id))
         if role:
             try:
                 await member.remove_roles(role)
             except:
                 pass
 
+LOOKUP_TABLE_REFRESH_INTERVAL = float(os.environ.get('LOOKUP_TABLE_REFRESH_INTERVAL', 60))
+
+@tasks.loop(seconds=LOOKUP_TABLE_REFRESH_INTERVAL)
+async def refresh_lookup_tables():
+    """Reload the in-memory routing tables when change streams can't keep them current"""
+    if refresh_lookup_tables.current_loop == 0 or change_streams_active():
+        return
+    try:
+        await load_reaction_role_index()
+        await load_temp_channel_registries()
+    except Exception as e:
+        logger.error(f'Error reloading lookup tables: {e}')
+
 # ==================== GENERAL COMMANDS ====================
 
 @bot.tree.command(name="help", description="Zeigt alle verfügbaren Befehle")
@@ -1244,7 +1786,9 @@ async def userinfo(interaction: discord.Interaction, user: discord.Member = None
     embed_color = int(config.get('bot_embed_color', '#5865F2').replace('#', ''), 16)
     
     # Get XP data
-    user_data = await get_user_data(str(interaction.guild.id), str(user.id))
+    user_data = await get_user_data(
+        str(interaction.guild.id), str(user.id), ["xp", "level", "messages", "voice_minutes"]
+    )
     
     embed = discord.Embed(
         title=f"👤 {user.display_name}",
@@ -1293,7 +1837,7 @@ async def warn(interaction: discord.Interaction, user: discord.Member, reason: s
     except:
         pass
     
-    warnings = await get_warnings(str(interaction.guild.id), str(user.id))
+    warnings = (await get_warnings(str(interaction.guild.id), str(user.id)))["items"]
     threshold = config.get('warn_threshold', 3)
     
     if len(warnings) >= threshold:
@@ -1611,7 +2155,7 @@ async def rr_reaction(
 
 @rr_group.command(name="list", description="Liste alle Reaction Roles")
 async def rr_list(interaction: discord.Interaction):
-    rrs = await get_reaction_roles(str(interaction.guild.id))
+    rrs = (await get_reaction_roles(str(interaction.guild.id)))["items"]
     
     if not rrs:
         await interaction.response.send_message("📭 Keine Reaction Roles konfiguriert.", ephemeral=True)
@@ -2160,20 +2704,26 @@ bot.tree.add_command(game_group)
 @app_commands.describe(user="Benutzer (optional)")
 async def rank(interaction: discord.Interaction, user: discord.Member = None):
     target = user or interaction.user
-    user_data = await get_user_data(str(interaction.guild.id), str(target.id))
+    user_data = await get_user_data(str(interaction.guild.id), str(target.id), ["xp", "messages"])
     
-    level = user_data['level']
-    xp = user_data['xp']
-    next_level_xp = xp_for_level(level + 1)
-    current_level_xp = xp_for_level(level)
+    curve = level_curve_for_config(await get_guild_config(str(interaction.guild.id)))
+    
+    # Buffered XP may already cross a threshold the stored level doesn't reflect yet
+    xp = user_data.get('xp', 0) + xp_accumulator.pending_xp(str(interaction.guild.id), str(target.id))
+    level = calculate_level(xp, curve)
+    next_level_xp = xp_for_level(level + 1, curve)
+    current_level_xp = xp_for_level(level, curve)
     progress = xp - current_level_xp
     needed = next_level_xp - current_level_xp
     
     embed = discord.Embed(title=f"Rang von {target.display_name}", color=discord.Color.blue())
     embed.add_field(name="Level", value=str(level), inline=True)
     embed.add_field(name="XP", value=f"{xp:,}", inline=True)
-    embed.add_field(name="Nachrichten", value=f"{user_data['messages']:,}", inline=True)
+    embed.add_field(name="Nachrichten", value=f"{user_data.get('messages', 0):,}", inline=True)
     embed.add_field(name="Fortschritt", value=f"{progress}/{needed} XP", inline=False)
+    position = await get_user_rank(str(interaction.guild.id), str(target.id))
+    if position["rank"]:
+        embed.add_field(name="Rang", value=f"#{position['rank']:,} von {position['total']:,}", inline=True)
     embed.set_thumbnail(url=target.display_avatar.url)
     
     await interaction.response.send_message(embed=embed)
@@ -2182,6 +2732,7 @@ async def rank(interaction: discord.Interaction, user: discord.Member = None):
 async def leaderboard(interaction: discord.Interaction):
     config = await get_guild_config(str(interaction.guild.id))
     users = await get_leaderboard(str(interaction.guild.id), 10)
+    names = await member_names.resolve(interaction.guild, [u['user_id'] for u in users])
     
     embed = discord.Embed(
         title=t(config.get('language', 'de'), 'leaderboard_title'),
@@ -2189,8 +2740,7 @@ async def leaderboard(interaction: discord.Interaction):
     )
     
     for i, u in enumerate(users, 1):
-        member = interaction.guild.get_member(int(u['user_id']))
-        name = member.display_name if member else f"User {u['user_id'][:8]}"
+        name = names.get(u['user_id']) or f"User {u['user_id'][:8]}"
         medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"#{i}"
         embed.add_field(
             name=f"{medal} {name}",
@@ -2202,152 +2752,501 @@ async def leaderboard(interaction: discord.Interaction):
 
 # ==================== SCHEDULED TASKS ====================
 
-@tasks.loop(minutes=1)
-async def check_scheduled_news():
+# Scheduled news are read from the due_at index: items due within NEWS_LOOKAHEAD
+# are posted on time, then the scheduler sleeps until the next due item. New
+# news wake it through the change stream; the sleep is capped so items are
+# still picked up without one (slow while the stream is up, fast without).
+NEWS_LOOKAHEAD = float(os.environ.get('NEWS_LOOKAHEAD', 5))
+NEWS_POLL_INTERVAL = float(os.environ.get('NEWS_POLL_INTERVAL', 60))
+NEWS_RECONCILE_INTERVAL = float(os.environ.get('NEWS_RECONCILE_INTERVAL', 600))
+NEWS_BATCH_SIZE = 100
+
+news_wakeup = asyncio.Event()
+
+def _on_news_change(change):
+    if change is None or change.get('operationType') in ('insert', 'replace'):
+        news_wakeup.set()
+
+on_collection_change("news", _on_news_change)
+
+async def post_scheduled_news(news_id: str):
+    """Claim a due news item and post it to the guild's news channel.
+
+    Items that can't be posted right now (bot not in the guild, no news
+    channel) stay claimed and are retried once the claim runs out.
+    """
+    news = await claim_due_news(news_id, ACTION_WORKER_ID)
+    if not news:
+        return  # Posted or claimed by another instance
+    
+    guild = bot.get_guild(int(news['guild_id']))
+    if not guild:
+        return
+    config = await get_guild_config(news['guild_id'])
+    channel = guild.get_channel(int(config['news_channel'])) if config.get('news_channel') else None
+    if not channel:
+        return
+    
+    embed = discord.Embed(
+        title=f"📢 {news['title']}",
+        description=news['content'],
+        color=discord.Color.blue(),
+        timestamp=datetime.now(timezone.utc)
+    )
+    await channel.send(embed=embed)
+    await mark_news_posted(news['id'])
+
+async def run_news_scheduler():
+    """Post scheduled news when they are due"""
     try:
-        for guild in bot.guilds:
-            config = await get_guild_config(str(guild.id))
-            if not config.get('news_channel'):
-                continue
+        backfilled = await backfill_news_due_times()
+        if backfilled:
+            logger.info(f"Scheduled {backfilled} news created before due times existed")
+    except Exception as e:
+        logger.error(f"News backfill error: {e}")
+    
+    while True:
+        timeout = NEWS_RECONCILE_INTERVAL if change_streams_active() else NEWS_POLL_INTERVAL
+        try:
+            # Cleared before the query, so news inserted while it runs still wake us
+            news_wakeup.clear()
+            upcoming = await get_upcoming_news(NEWS_BATCH_SIZE)
+            horizon = datetime.now(timezone.utc) + timedelta(seconds=NEWS_LOOKAHEAD)
+            due = [news for news in upcoming if news['due_at'] <= horizon]
             
-            news_list = await get_news(str(guild.id))
-            now = datetime.now(timezone.utc)
+            for news in due:
+                delay = (news['due_at'] - datetime.now(timezone.utc)).total_seconds()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    await post_scheduled_news(news['id'])
+                except Exception as e:
+                    logger.error(f"Error posting news {news['id']}: {e}")
             
-            for news in news_list:
-                if news.get('posted'):
-                    continue
-                
-                scheduled = news.get('scheduled_for')
-                if scheduled:
-                    scheduled_time = datetime.fromisoformat(scheduled.replace('Z', '+00:00'))
-                    if scheduled_time <= now:
-                        channel = guild.get_channel(int(config['news_channel']))
-                        if channel:
-                            embed = discord.Embed(
-                                title=f"📢 {news['title']}",
-                                description=news['content'],
-                                color=discord.Color.blue(),
-                                timestamp=now
-                            )
-                            await channel.send(embed=embed)
-                            await mark_news_posted(news['id'])
-    except Exception as e:
-        logger.error(f"News check error: {e}")
+            if len(due) == NEWS_BATCH_SIZE:
+                continue  # More due items than one batch
+            if len(upcoming) > len(due):
+                next_due = upcoming[len(due)]['due_at']
+                timeout = min(timeout, (next_due - datetime.now(timezone.utc)).total_seconds())
+        except Exception as e:
+            logger.error(f"News scheduler error: {e}")
+        
+        try:
+            await asyncio.wait_for(news_wakeup.wait(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+
+async def flush_message_xp():
+    """Write buffered message XP and handle the resulting level-ups"""
+    curves = {}
+    flushed = await xp_accumulator.flush()
+    await remember_active_profiles([user_doc for user_doc, _ in flushed])
+    for user_doc, channel_id in flushed:
+        guild_id = user_doc['guild_id']
+        if guild_id not in curves:
+            curves[guild_id] = level_curve_for_config(await get_guild_config(guild_id))
+        new_level = calculate_level(user_doc.get('xp', 0), curves[guild_id])
+        old_level = user_doc.get('level', 0)
+        if new_level <= old_level:
+            continue
+        if not await promote_user_level(user_doc['guild_id'], user_doc['user_id'], new_level):
+            continue  # Already announced by another writer
+        
+        try:
+            await announce_message_level_up(user_doc['guild_id'], user_doc['user_id'], old_level, new_level, channel_id)
+        except Exception as e:
+            logger.error(f"Level-up error for {user_doc['user_id']}: {e}")
+
+async def remember_active_profiles(user_docs: list):
+    """Keep stored profiles of members who just earned XP fresh for the leaderboards"""
+    by_guild = {}
+    for user_doc in user_docs:
+        by_guild.setdefault(user_doc['guild_id'], []).append(user_doc['user_id'])
+    for guild_id, user_ids in by_guild.items():
+        guild = bot.get_guild(int(guild_id))
+        if not guild:
+            continue
+        members = [m for m in (guild.get_member(int(user_id)) for user_id in user_ids) if m]
+        try:
+            await member_names.remember(guild_id, members)
+        except Exception as e:
+            logger.error(f"Error saving member profiles: {e}")
 
-@tasks.loop(minutes=1)
-async def voice_xp_task():
-    """Award XP to users in voice channels"""
-    from database import get_active_voice_sessions, get_level_rewards
+async def announce_message_level_up(guild_id: str, user_id: str, old_level: int, new_level: int, channel_id: int):
+    guild = bot.get_guild(int(guild_id))
+    if not guild:
+        return
+    member = guild.get_member(int(user_id))
+    if not member:
+        return
+    
+    config = await get_guild_config(guild_id)
+    lang = config.get('language', 'de')
+    
+    # Several levels can be gained in one flush - grant every role on the way
+    level_roles = config.get('level_roles', {})
+    for level in range(old_level + 1, new_level + 1):
+        if str(level) in level_roles:
+            role = guild.get_role(int(level_roles[str(level)]))
+            if role:
+                try:
+                    await member.add_roles(role)
+                except:
+                    pass
     
+    level_channel = guild.get_channel(channel_id) if channel_id else None
+    if config.get('level_up_channel'):
+        level_channel = guild.get_channel(int(config['level_up_channel'])) or level_channel
+    if level_channel:
+        await level_channel.send(t(lang, 'level_up', user=member.mention, level=new_level))
+
+@tasks.loop(seconds=XP_FLUSH_INTERVAL)
+async def flush_xp_task():
+    """Write buffered message XP to the database"""
     try:
-        for guild in bot.guilds:
-            config = await get_guild_config(str(guild.id))
-            
-            if not config.get('voice_xp_enabled'):
-                continue
-            
-            xp_per_minute = config.get('voice_xp_per_minute', 5)
-            min_users = config.get('voice_xp_min_users', 2)
-            afk_channel_id = config.get('voice_afk_channel')
-            
-            # Get all voice channels with users
-            for vc in guild.voice_channels:
-                # Skip AFK channel
-                if afk_channel_id and str(vc.id) == afk_channel_id:
-                    continue
-                
-                # Count non-bot members
-                members = [m for m in vc.members if not m.bot]
-                
-                # Check minimum users
-                if len(members) < min_users:
-                    continue
-                
-                # Award XP to each member
-                for member in members:
-                    # Check if deafened or muted (optional - skip if self-muted)
-                    voice_state = member.voice
-                    if voice_state and voice_state.self_deaf:
-                        continue  # Skip self-deafened users
-                    
-                    user_data = await get_user_data(str(guild.id), str(member.id))
-                    new_xp = user_data['xp'] + xp_per_minute
-                    old_level = user_data['level']
-                    new_level = calculate_level(new_xp)
-                    
-                    # Update XP (add voice_minutes tracking)
-                    voice_minutes = user_data.get('voice_minutes', 0) + 1
-                    await update_user_data(str(guild.id), str(member.id), {
-                        'xp': new_xp,
-                        'level': new_level,
-                        'voice_minutes': voice_minutes
-                    })
-                    
-                    # Level up!
-                    if new_level > old_level:
-                        # Check level rewards
-                        rewards = await get_level_rewards(str(guild.id))
-                        for reward in rewards:
-                            if reward.get('enabled') and reward.get('level') == new_level:
-                                if reward.get('reward_type') == 'role':
-                                    role = guild.get_role(int(reward['reward_value']))
-                                    if role:
-                                        try:
-                                            await member.add_roles(role)
-                                        except:
-                                            pass
-                        
-                        # Send level up message (find appropriate channel)
-                        level_channel_id = config.get('level_up_channel')
-                        if level_channel_id:
-                            channel = guild.get_channel(int(level_channel_id))
-                            if channel:
-                                lang = config.get('language', 'de')
-                                await channel.send(f"🎉 {member.mention} ist jetzt Level **{new_level}**! (Voice XP)")
-                        
+        await flush_message_xp()
     except Exception as e:
-        logger.error(f"Voice XP task error: {e}")
+        logger.error(f"XP flush error: {e}")
+
+LEVEL_REWARD_CONCURRENCY = int(os.environ.get('LEVEL_REWARD_CONCURRENCY', 4))
+LEVEL_REWARD_INTERVAL = float(os.environ.get('LEVEL_REWARD_INTERVAL', 0.2))
+
+class LevelRewardWorker:
+    """Grants voice level-up rewards off the XP tick.
+
+    Runs a few concurrent workers that share a minimum spacing between jobs,
+    so a burst of level-ups doesn't hammer the Discord API.
+    """
+    def __init__(self, concurrency: int, min_interval: float):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.queue = asyncio.Queue()
+        self.workers = []
+        self._next_slot = 0.0
+    
+    def start(self):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+    
+    def submit(self, guild: discord.Guild, user_id: str, old_level: int, new_level: int, rewards: list, config: dict):
+        self.queue.put_nowait((guild, user_id, old_level, new_level, rewards, config))
+    
+    async def _wait_for_slot(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    async def _run(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._wait_for_slot()
+                await grant_voice_level_up(*job)
+            except Exception as e:
+                logger.error(f"Level reward error: {e}")
+            finally:
+                self.queue.task_done()
 
-@tasks.loop(seconds=3)  # Check every 3 seconds for fast response
-async def process_pending_actions():
-    """Process pending actions from the API"""
-    try:
-        from database import get_pending_actions, mark_action_complete, delete_old_actions
+level_reward_worker = LevelRewardWorker(LEVEL_REWARD_CONCURRENCY, LEVEL_REWARD_INTERVAL)
+
+async def grant_voice_level_up(guild: discord.Guild, user_id: str, old_level: int, new_level: int, rewards: list, config: dict):
+    """Store the new level, grant level rewards and announce it"""
+    if not await promote_user_level(str(guild.id), user_id, new_level):
+        return  # Already handled by another writer
+    
+    member = guild.get_member(int(user_id))
+    if not member:
+        return
+    
+    for reward in rewards:
+        if reward.get('enabled') and old_level < reward.get('level', 0) <= new_level:
+            if reward.get('reward_type') == 'role':
+                role = guild.get_role(int(reward['reward_value']))
+                if role:
+                    try:
+                        await member.add_roles(role)
+                    except:
+                        pass
+    
+    # Send level up message (find appropriate channel)
+    level_channel_id = config.get('level_up_channel')
+    if level_channel_id:
+        channel = guild.get_channel(int(level_channel_id))
+        if channel:
+            await channel.send(f"🎉 {member.mention} ist jetzt Level **{new_level}**! (Voice XP)")
+
+async def award_guild_voice_xp(guild: discord.Guild):
+    """Award one minute of voice XP to every eligible member of a guild"""
+    from database import get_level_rewards
+    
+    config = await get_guild_config(str(guild.id))
+    if not config.get('voice_xp_enabled'):
+        return
+    
+    xp_per_minute = config.get('voice_xp_per_minute', 5)
+    min_users = config.get('voice_xp_min_users', 2)
+    afk_channel_id = config.get('voice_afk_channel')
+    
+    increments = {}
+    for vc in guild.voice_channels:
+        # Skip AFK channel
+        if afk_channel_id and str(vc.id) == afk_channel_id:
+            continue
         
-        # Clean up old actions periodically
-        await delete_old_actions()
+        # Count non-bot members
+        members = [m for m in vc.members if not m.bot]
         
-        actions = await get_pending_actions()
+        # Check minimum users
+        if len(members) < min_users:
+            continue
         
-        for action in actions:
+        for member in members:
+            # Skip self-deafened users
+            if member.voice and member.voice.self_deaf:
+                continue
+            increments[(str(guild.id), str(member.id))] = {"xp": xp_per_minute, "voice_minutes": 1}
+    
+    if not increments:
+        return
+    for _, user_id in increments:
+        activity_counter.record(str(guild.id), user_id, xp=xp_per_minute, voice_minutes=1)
+    
+    user_docs = await apply_user_increments(increments)
+    await remember_active_profiles(user_docs)
+    
+    curve = level_curve_for_config(config)
+    level_ups = []
+    for user_doc in user_docs:
+        new_level = calculate_level(user_doc.get('xp', 0), curve)
+        if new_level > user_doc.get('level', 0):
+            level_ups.append((user_doc, new_level))
+    
+    if level_ups:
+        rewards = await get_level_rewards(str(guild.id))
+        for user_doc, new_level in level_ups:
+            level_reward_worker.submit(guild, user_doc['user_id'], user_doc.get('level', 0), new_level, rewards, config)
+
+@tasks.loop(seconds=ACTIVITY_FLUSH_INTERVAL)
+async def flush_activity_task():
+    """Write buffered activity counters to the hourly rollups"""
+    try:
+        await activity_counter.flush()
+    except Exception as e:
+        logger.error(f"Activity flush error: {e}")
+
+@tasks.loop(seconds=VOICE_SESSION_FLUSH_INTERVAL)
+async def flush_voice_sessions_task():
+    """Write finished voice sessions and the open-session mirror"""
+    try:
+        await voice_ledger.flush()
+    except Exception as e:
+        logger.error(f"Voice session flush error: {e}")
+
+@tasks.loop(minutes=1)
+async def voice_xp_task():
+    """Award XP to users in voice channels"""
+    # Snapshot, so results line up with their guild even if guilds join or leave meanwhile
+    guilds = list(bot.guilds)
+    results = await asyncio.gather(
+        *(award_guild_voice_xp(guild) for guild in guilds),
+        return_exceptions=True
+    )
+    for guild, result in zip(guilds, results):
+        if isinstance(result, Exception):
+            logger.error(f"Voice XP task error in {guild.name}: {result}")
+
+# ==================== PENDING ACTIONS ====================
+
+# Actions are pushed through the change stream on pending_actions. Polling only
+# remains as a fallback: slow while the stream is up, fast without one.
+PENDING_ACTIONS_POLL_INTERVAL = float(os.environ.get('PENDING_ACTIONS_POLL_INTERVAL', 3))
+PENDING_ACTIONS_RECONCILE_INTERVAL = float(os.environ.get('PENDING_ACTIONS_RECONCILE_INTERVAL', 60))
+ACTION_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+pending_actions_wakeup = asyncio.Event()
+
+def _on_pending_action_change(change):
+    if change is None or change.get('operationType') == 'insert':
+        pending_actions_wakeup.set()
+
+on_collection_change("pending_actions", _on_pending_action_change)
+
+PENDING_ACTIONS_CONCURRENCY = int(os.environ.get('PENDING_ACTIONS_CONCURRENCY', 8))
+PENDING_ACTION_MAX_ATTEMPTS = int(os.environ.get('PENDING_ACTION_MAX_ATTEMPTS', 4))
+PENDING_ACTION_RETRY_DELAY = float(os.environ.get('PENDING_ACTION_RETRY_DELAY', 2))
+
+async def run_pending_action(action: dict):
+    """Run a single action from the API. Raises on failure."""
+    action_type = action.get('type')
+    data = action.get('data', {})
+    
+    guild = bot.get_guild(int(action.get('guild_id')))
+    if not guild:
+        return
+    
+    if action_type == "send_reaction_role":
+        await send_reaction_role_to_channel(guild, data)
+    elif action_type == "send_ticket_panel":
+        await send_ticket_panel_to_channel(guild, data)
+    elif action_type == "update_reaction_role":
+        await update_reaction_role_in_channel(guild, data)
+    elif action_type == "update_ticket_panel":
+        await update_ticket_panel_in_channel(guild, data)
+    else:
+        logger.warning(f"Unknown action type: {action_type}")
+
+class ActionExecutor:
+    """Runs pending actions concurrently across guilds, in order within a guild.
+
+    Every guild gets a FIFO lane with at most one running action; a global
+    semaphore caps how many lanes run at once. A failing action is retried
+    with exponential backoff in its lane and only marked failed after the
+    last attempt. Each attempt first renews the action's claim, so time spent
+    queued or backing off can't let another instance reclaim and run it too.
+    """
+    def __init__(self, concurrency: int, max_attempts: int, retry_delay: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_queued = concurrency * 4
+        self.lanes = {}  # guild_id -> deque of (action, queued_at)
+        self.workers = {}  # guild_id -> lane task
+        self.has_capacity = asyncio.Event()
+        self.has_capacity.set()
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.latency = {}  # action type -> {"count", "total_ms", "max_ms", "last_ms"}
+    
+    def depth(self) -> int:
+        return sum(len(lane) for lane in self.lanes.values())
+    
+    def submit(self, action: dict):
+        guild_id = action.get('guild_id')
+        self.lanes.setdefault(guild_id, collections.deque()).append((action, time.monotonic()))
+        if self.depth() >= self.max_queued:
+            self.has_capacity.clear()
+        if guild_id not in self.workers:
+            self.workers[guild_id] = asyncio.create_task(self._run_lane(guild_id))
+    
+    async def _run_lane(self, guild_id: str):
+        lane = self.lanes[guild_id]
+        try:
+            while lane:
+                action, queued_at = lane[0]
+                await self._run_with_retry(action, queued_at)
+                lane.popleft()
+                if self.depth() < self.max_queued:
+                    self.has_capacity.set()
+        finally:
+            del self.workers[guild_id]
+            if not lane:
+                self.lanes.pop(guild_id, None)
+    
+    async def _run_with_retry(self, action: dict, queued_at: float):
+        from database import mark_action_complete, mark_action_failed, renew_action_claim
+        
+        for attempt in range(1, self.max_attempts + 1):
             try:
-                action_type = action.get('type')
-                guild_id = action.get('guild_id')
-                data = action.get('data', {})
-                
-                guild = bot.get_guild(int(guild_id))
-                if not guild:
-                    await mark_action_complete(action['id'])
+                async with self.semaphore:
+                    if not await renew_action_claim(action['id'], action.get('claimed_by')):
+                        logger.warning(f"Action {action.get('id')} was reclaimed by another instance, skipping it")
+                        return
+                    await run_pending_action(action)
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    self.retries += 1
+                    delay = self.retry_delay * 2 ** (attempt - 1)
+                    logger.warning(f"Action {action.get('id')} failed (attempt {attempt}), retrying in {delay}s: {e}")
+                    await asyncio.sleep(delay)
                     continue
                 
-                if action_type == "send_reaction_role":
-                    await send_reaction_role_to_channel(guild, data)
-                elif action_type == "send_ticket_panel":
-                    await send_ticket_panel_to_channel(guild, data)
-                elif action_type == "update_reaction_role":
-                    await update_reaction_role_in_channel(guild, data)
-                elif action_type == "update_ticket_panel":
-                    await update_ticket_panel_in_channel(guild, data)
-                
+                self.failed += 1
+                logger.error(f"Action {action.get('id')} failed after {attempt} attempts: {e}")
+                try:
+                    await mark_action_failed(action['id'], str(e))
+                except Exception as e:
+                    logger.error(f"Error marking action {action.get('id')} failed: {e}")
+                return
+            
+            self._record_latency(action.get('type'), queued_at)
+            self.completed += 1
+            logger.info(f"Processed action: {action.get('type')}")
+            try:
                 await mark_action_complete(action['id'])
-                logger.info(f"Processed action: {action_type}")
-                
             except Exception as e:
-                logger.error(f"Error processing action {action.get('id')}: {e}")
-                await mark_action_complete(action['id'])  # Mark as complete to avoid infinite loop
-                
+                logger.error(f"Error marking action {action.get('id')} complete: {e}")
+            return
+    
+    def _record_latency(self, action_type: str, queued_at: float):
+        elapsed_ms = (time.monotonic() - queued_at) * 1000
+        stats = self.latency.setdefault(action_type, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["last_ms"] = elapsed_ms
+    
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.depth(),
+            "active_guilds": len(self.workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "latency": {
+                action_type: {
+                    "count": s["count"],
+                    "avg_ms": round(s["total_ms"] / s["count"], 1),
+                    "max_ms": round(s["max_ms"], 1),
+                    "last_ms": round(s["last_ms"], 1)
+                }
+                for action_type, s in self.latency.items()
+            }
+        }
+
+action_executor = ActionExecutor(PENDING_ACTIONS_CONCURRENCY, PENDING_ACTION_MAX_ATTEMPTS, PENDING_ACTION_RETRY_DELAY)
+
+async def process_pending_actions():
+    """Claim pending actions from the API as they arrive and hand them to the executor"""
+    from database import claim_pending_action, delete_old_actions
+    
+    # Expiry is handled by the TTL index; this only clears actions created
+    # before they carried an expires_at
+    try:
+        await delete_old_actions()
     except Exception as e:
-        logger.error(f"Pending actions task error: {e}")
+        logger.error(f"Error deleting old actions: {e}")
+    
+    while True:
+        try:
+            while True:
+                # Don't claim more than we can run before the claim times out
+                await action_executor.has_capacity.wait()
+                action = await claim_pending_action(ACTION_WORKER_ID)
+                if not action:
+                    break
+                action_executor.submit(action)
+        except Exception as e:
+            logger.error(f"Pending actions task error: {e}")
+        
+        timeout = PENDING_ACTIONS_RECONCILE_INTERVAL if change_streams_active() else PENDING_ACTIONS_POLL_INTERVAL
+        try:
+            await asyncio.wait_for(pending_actions_wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        pending_actions_wakeup.clear()
+
+@tasks.loop(seconds=30)
+async def publish_action_stats():
+    """Store executor and connection pool metrics for the dashboard API"""
+    from database import set_system_state
+    try:
+        await set_system_state("action_executor", action_executor.stats())
+        await set_system_state("bot_db_pool", pool_stats())
+    except Exception as e:
+        logger.error(f"Error publishing action stats: {e}")
 
 async def send_reaction_role_to_channel(guild: discord.Guild, data: dict):
     """Send a reaction role embed to a channel"""
@@ -2385,32 +3284,12 @@ async def send_reaction_role_to_channel(guild: discord.Guild, data: dict):
     view = ui.View(timeout=None)
     
     for i, role_data in enumerate(roles[:10]):
-        emoji = role_data.get('emoji', '🎮')
-        role_id = role_data.get('role_id')
-        label = role_data.get('label', '')
-        
-        button = ui.Button(
-            label=label or f"Rolle {i+1}",
-            emoji=emoji,
-            style=discord.ButtonStyle.primary,
-            custom_id=f"rr_{rr.get('id')}_{role_id}"
-        )
-        
-        async def button_callback(interaction: discord.Interaction, rid=role_id):
-            role = interaction.guild.get_role(int(rid))
-            if not role:
-                await interaction.response.send_message("❌ Rolle nicht gefunden!", ephemeral=True)
-                return
-            
-            if role in interaction.user.roles:
-                await interaction.user.remove_roles(role)
-                await interaction.response.send_message(f"✅ Rolle **{role.name}** entfernt!", ephemeral=True)
-            else:
-                await interaction.user.add_roles(role)
-                await interaction.response.send_message(f"✅ Rolle **{role.name}** erhalten!", ephemeral=True)
-        
-        button.callback = button_callback
-        view.add_item(button)
+        view.add_item(ReactionRoleButton(
+            rr.get('id'),
+            role_data.get('role_id'),
+            emoji=role_data.get('emoji', '🎮'),
+            label=role_data.get('label', '') or f"Rolle {i+1}"
+        ))
     
     message = await channel.send(embed=embed, view=view)
     
@@ -2454,28 +3333,11 @@ async def send_ticket_panel_to_channel(guild: discord.Guild, data: dict):
     
     # Create button
     view = ui.View(timeout=None)
-    button = ui.Button(
+    view.add_item(TicketPanelButton(
+        panel_id,
         label=panel.get('button_label', 'Ticket erstellen'),
-        emoji=panel.get('button_emoji', '🎫'),
-        style=discord.ButtonStyle.primary,
-        custom_id=f"ticket_panel_{panel_id}"
-    )
-    
-    async def ticket_button_callback(interaction: discord.Interaction):
-        create_view = TicketCreateView(panel_id)
-        # Check for categories
-        if panel.get('categories'):
-            cat_view = TicketCategorySelectView(panel_id, panel['categories'])
-            await interaction.response.send_message(
-                "📋 **Wähle eine Kategorie für dein Ticket:**",
-                view=cat_view,
-                ephemeral=True
-            )
-        else:
-            await create_view.do_create_ticket(interaction, panel, None)
-    
-    button.callback = ticket_button_callback
-    view.add_item(button)
+        emoji=panel.get('button_emoji', '🎫')
+    ))
     
     message = await channel.send(embed=embed, view=view)
     
@@ -2598,19 +3460,12 @@ async def ticket_panel(interaction: discord.Interaction, panel_id: str):
     
     # Create button
     view = ui.View(timeout=None)
-    button = ui.Button(
+    view.add_item(TicketPanelButton(
+        panel_id,
         label=panel.get('button_label', 'Ticket erstellen'),
         emoji=panel.get('button_emoji', '🎫'),
-        style=discord.ButtonStyle.primary,
-        custom_id=f"panel_create_{panel_id}"
-    )
-    
-    async def button_callback(interaction: discord.Interaction):
-        create_view = TicketCreateView(panel_id)
-        await create_view.create_ticket_btn.callback(create_view, interaction, button)
-    
-    button.callback = button_callback
-    view.add_item(button)
+        prefix="panel_create"
+    ))
     
     await interaction.channel.send(embed=embed, view=view)
     await interaction.response.send_message("✅ Panel gesendet!", ephemeral=True)
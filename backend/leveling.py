@@ -0,0 +1,127 @@
+import bisect
+from functools import lru_cache
+
+from sortedcontainers import SortedList
+
+DEFAULT_LEVEL_CURVE_BASE = 100
+DEFAULT_LEVEL_CURVE_FACTOR = 1.1
+
+
+class LevelCurve:
+    """XP curve where going from level L to L+1 costs int(base * factor ** L) XP.
+
+    Cumulative thresholds are precomputed into a table that grows on demand, so
+    level lookups are a bisect and threshold lookups are an index. The integer
+    truncation is applied per level, exactly like the original loop did.
+    """
+
+    def __init__(self, base: int = DEFAULT_LEVEL_CURVE_BASE, factor: float = DEFAULT_LEVEL_CURVE_FACTOR):
+        if int(base) < 1 or factor < 1:
+            raise ValueError("level curve needs base >= 1 and factor >= 1")
+        self.base = base
+        self.factor = factor
+        # thresholds[L] = total XP needed to reach level L
+        self._thresholds = [0]
+
+    def _required(self, level: int) -> int:
+        return int(self.base * (self.factor ** level))
+
+    def _extend_to_level(self, level: int):
+        thresholds = self._thresholds
+        while len(thresholds) <= level:
+            thresholds.append(thresholds[-1] + self._required(len(thresholds) - 1))
+
+    def _extend_to_xp(self, xp: int):
+        thresholds = self._thresholds
+        while thresholds[-1] <= xp:
+            thresholds.append(thresholds[-1] + self._required(len(thresholds) - 1))
+
+    def level_for_xp(self, xp: int) -> int:
+        if xp <= 0:
+            return 0
+        self._extend_to_xp(xp)
+        return bisect.bisect_right(self._thresholds, xp) - 1
+
+    def xp_for_level(self, level: int) -> int:
+        if level <= 0:
+            return 0
+        self._extend_to_level(level)
+        return self._thresholds[level]
+
+
+@lru_cache(maxsize=128)
+def _shared_curve(base: int, factor: float) -> LevelCurve:
+    return LevelCurve(base, factor)
+
+
+def get_level_curve(base: int = DEFAULT_LEVEL_CURVE_BASE, factor: float = DEFAULT_LEVEL_CURVE_FACTOR) -> LevelCurve:
+    """Shared curve instance per (base, factor), so tables are only built once"""
+    return _shared_curve(base, float(factor))
+
+
+def level_curve_for_config(config: dict = None) -> LevelCurve:
+    """Curve configured for a guild, falling back to the default on missing or invalid values"""
+    config = config or {}
+    base = config.get("level_curve_base") or DEFAULT_LEVEL_CURVE_BASE
+    factor = config.get("level_curve_factor") or DEFAULT_LEVEL_CURVE_FACTOR
+    try:
+        return get_level_curve(base, factor)
+    except (TypeError, ValueError):
+        return get_level_curve()
+
+
+def calculate_level(xp: int, curve: LevelCurve = None) -> int:
+    return (curve or get_level_curve()).level_for_xp(xp)
+
+
+def xp_for_level(level: int, curve: LevelCurve = None) -> int:
+    return (curve or get_level_curve()).xp_for_level(level)
+
+
+class Leaderboard:
+    """XP ranking of one guild, kept as a SortedList of (-xp, user_id).
+
+    Updates, rank lookups and page slices are O(log n); ties in XP are ordered
+    by user id so ranks are stable.
+    """
+
+    def __init__(self):
+        self._keys = SortedList()
+        self._xp = {}
+
+    def load(self, entries):
+        """Replace the ranking with (user_id, xp) pairs"""
+        self._xp = {user_id: xp or 0 for user_id, xp in entries}
+        self._keys = SortedList((-xp, user_id) for user_id, xp in self._xp.items())
+
+    def set(self, user_id: str, xp: int):
+        xp = xp or 0
+        old = self._xp.get(user_id)
+        if old == xp:
+            return
+        if old is not None:
+            self._keys.remove((-old, user_id))
+        self._xp[user_id] = xp
+        self._keys.add((-xp, user_id))
+
+    def remove(self, user_id: str):
+        old = self._xp.pop(user_id, None)
+        if old is not None:
+            self._keys.remove((-old, user_id))
+
+    def rank(self, user_id: str) -> int:
+        """1-based rank of a user, None if they have no XP entry"""
+        xp = self._xp.get(user_id)
+        if xp is None:
+            return None
+        return self._keys.bisect_left((-xp, user_id)) + 1
+
+    def page(self, offset: int = 0, limit: int = 10) -> list:
+        """(user_id, xp) pairs from rank offset+1 on"""
+        return [(user_id, -neg_xp) for neg_xp, user_id in self._keys.islice(offset, offset + limit)]
+
+    def xp(self, user_id: str) -> int:
+        return self._xp.get(user_id)
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,149 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from dotenv import load_dotenv
+from pathlib import Path
+import importlib.util
+import logging
+import os
+import threading
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger('mongo')
+
+# Compressors and the package each one needs (zlib ships with Python)
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Counts connections per server from the driver's pool events.
+
+    The driver calls listeners from its own threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def _pool(self, address) -> dict:
+        key = f"{address[0]}:{address[1]}"
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {
+                "open": 0, "checked_out": 0, "waiting": 0,
+                "checkouts": 0, "checkout_failures": 0, "cleared": 0
+            }
+        return pool
+
+    def _update(self, address, **deltas):
+        with self._lock:
+            pool = self._pool(address)
+            for field, delta in deltas.items():
+                pool[field] += delta
+
+    def pool_created(self, event):
+        self._update(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        self._update(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event.address, waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._update(event.address, waiting=-1, checked_out=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, checked_out=-1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {address: dict(pool) for address, pool in self._pools.items()}
+
+
+pool_monitor = PoolMonitor()
+_client = None
+_client_options = {}
+
+
+def available_compressors(names: str) -> list:
+    """Compressors from a comma separated list whose packages are installed"""
+    compressors = []
+    for name in (n.strip() for n in names.split(",")):
+        module = _COMPRESSOR_MODULES.get(name)
+        if not module:
+            logger.warning(f"Unknown MongoDB compressor: {name}")
+        elif importlib.util.find_spec(module) is None:
+            logger.info(f"MongoDB compressor {name} needs the {module} package, skipping it")
+        else:
+            compressors.append(name)
+    return compressors
+
+
+def client_options() -> dict:
+    """Pool, timeout and compression settings, configurable via environment"""
+    options = {
+        "tz_aware": True,  # BSON dates are read back as UTC datetimes
+        "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+        "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+        "maxIdleTimeMS": int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000)),
+        "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 10000)),
+        "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000)),
+        "event_listeners": [pool_monitor],
+    }
+    wait_queue_timeout = os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+    if wait_queue_timeout:
+        options["waitQueueTimeoutMS"] = int(wait_queue_timeout)
+    compressors = available_compressors(os.environ.get('MONGO_COMPRESSORS', 'zstd,snappy,zlib'))
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+def get_client() -> AsyncIOMotorClient:
+    """The process-wide client; every module shares its connection pool"""
+    global _client, _client_options
+    if _client is None:
+        options = _client_options = client_options()
+        _client = AsyncIOMotorClient(os.environ['MONGO_URL'], **options)
+        logger.info(
+            f"MongoDB pool: max {options['maxPoolSize']}, min {options['minPoolSize']}, "
+            f"compressors {options.get('compressors', 'none')}"
+        )
+    return _client
+
+
+def get_database(name: str = None):
+    return get_client()[name or os.environ['DB_NAME']]
+
+
+def pool_stats() -> dict:
+    """Connection pool usage of this process, per server"""
+    servers = pool_monitor.snapshot()
+    return {
+        "max_pool_size": _client_options.get("maxPoolSize"),
+        "min_pool_size": _client_options.get("minPoolSize"),
+        "servers": servers,
+        "checked_out": sum(pool["checked_out"] for pool in servers.values()),
+        "waiting": sum(pool["waiting"] for pool in servers.values()),
+    }
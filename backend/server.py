@@ -1,8 +1,8 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Depends, Header
+from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Depends, Header, Query
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
@@ -15,15 +15,18 @@ import subprocess
 import sys
 import hashlib
 import secrets
+import json
 import jwt
+from email.utils import format_datetime, parsedate_to_datetime
+
+from mongo import get_client, get_database, pool_stats
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, the same client (and pool) the database helpers use
+client = get_client()
+db = get_database()
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', secrets.token_hex(32))
@@ -40,6 +43,52 @@ from database import (
     add_custom_command, get_custom_commands, delete_custom_command,
     add_news, get_news, delete_news, get_mod_logs, add_mod_log
 )
+from database import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, iter_pages
+from database import get_guild_configs, get_dashboard_users, get_tickets, get_temp_channels
+from database import get_reaction_roles, get_active_voice_sessions
+from database import attach_user_profiles, utcnow
+from database import GUILD_FIELDS, USER_FIELDS, SERVER_DATA_FIELDS
+from cache import TTLCache
+
+# ==================== LIST HELPERS ====================
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+async def _ndjson_lines(documents):
+    async for doc in documents:
+        yield json.dumps(doc, default=_json_default, ensure_ascii=False) + "\n"
+
+async def list_response(key: str, get_page, *args, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                        output_format: Optional[str] = None, **kwargs):
+    """One page of a paged database helper, or an NDJSON stream of all its items for exports"""
+    if output_format == "ndjson":
+        return StreamingResponse(
+            _ndjson_lines(iter_pages(get_page, *args, **kwargs)),
+            media_type="application/x-ndjson"
+        )
+    try:
+        page = await get_page(*args, after=after, limit=limit, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {key: page["items"], "next_cursor": page["next_cursor"]}
+
+# Shared query parameters of list routes
+PageAfter = Query(None, description="next_cursor of the previous page")
+PageLimit = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+OutputFormat = Query(None, alias="format", pattern="^(json|ndjson)$")
+
+# ?fields=a,b returns only these top-level fields
+Fields = Query(None, pattern=r"^\w+(,\w+)*$", description="Comma separated fields to return")
+
+def parse_fields(fields: Optional[str], allowed: frozenset) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = fields.split(",")
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unbekannte Felder: {', '.join(unknown)}")
+    return requested
 
 # Create the main app
 app = FastAPI(title="Discord Bot Command Center API")
@@ -129,7 +178,7 @@ class UserResponse(BaseModel):
     username: str
     email: str
     is_admin: bool
-    created_at: str
+    created_at: datetime
 
 class BotConfig(BaseModel):
     discord_token: Optional[str] = None
@@ -154,6 +203,8 @@ class GuildConfigUpdate(BaseModel):
     level_up_channel: Optional[str] = None
     level_roles: Optional[Dict[str, str]] = None
     ignored_channels: Optional[List[str]] = None
+    level_curve_base: Optional[int] = Field(None, ge=10, le=100000)
+    level_curve_factor: Optional[float] = Field(None, ge=1.01, le=3.0)
     # Voice XP
     voice_xp_enabled: Optional[bool] = None
     voice_xp_per_minute: Optional[int] = None
@@ -221,7 +272,7 @@ async def register(user_data: UserRegister):
         "email": user_data.email,
         "password_hash": hash_password(user_data.password),
         "is_admin": is_admin,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     
     await db.dashboard_users.insert_one(user)
@@ -273,10 +324,10 @@ async def get_me(current_user: dict = Depends(require_auth)):
     return user
 
 @api_router.get("/auth/users")
-async def list_users(current_user: dict = Depends(require_admin)):
+async def list_users(current_user: dict = Depends(require_admin), after: Optional[str] = PageAfter,
+                     limit: int = PageLimit, output_format: Optional[str] = OutputFormat):
     """List all users (admin only)"""
-    users = await db.dashboard_users.find({}, {"_id": 0, "password_hash": 0}).to_list(100)
-    return {"users": users}
+    return await list_response("users", get_dashboard_users, after=after, limit=limit, output_format=output_format)
 
 @api_router.put("/auth/users/{user_id}/admin")
 async def toggle_admin(user_id: str, is_admin: bool, current_user: dict = Depends(require_admin)):
@@ -326,6 +377,41 @@ async def get_bot_status():
         "openai_configured": bool(os.environ.get('OPENAI_API_KEY') or os.environ.get('EMERGENT_LLM_KEY'))
     }
 
+@api_router.get("/bot/actions")
+async def get_action_stats():
+    """Get pending action queue depth and executor metrics reported by the bot"""
+    from database import get_pending_action_counts, get_system_state
+    counts = await get_pending_action_counts()
+    executor = await get_system_state("action_executor")
+    return {
+        "pending": counts.get("pending", 0),
+        "processing": counts.get("processing", 0),
+        "failed": counts.get("failed", 0),
+        "executor": executor.get("data") if executor else None,
+        "executor_updated_at": executor.get("updated_at") if executor else None
+    }
+
+@api_router.get("/bot/startup")
+async def get_startup_report():
+    """Get the timing report of the bot's last startup sync"""
+    from database import get_system_state
+    report = await get_system_state("startup")
+    return {
+        "report": report.get("data") if report else None,
+        "updated_at": report.get("updated_at") if report else None
+    }
+
+@api_router.get("/db/pool")
+async def get_db_pool_stats():
+    """Get MongoDB connection pool usage of the API process and the bot"""
+    from database import get_system_state
+    bot_pool = await get_system_state("bot_db_pool")
+    return {
+        "api": pool_stats(),
+        "bot": bot_pool.get("data") if bot_pool else None,
+        "bot_updated_at": bot_pool.get("updated_at") if bot_pool else None
+    }
+
 @api_router.post("/bot/configure")
 async def configure_bot(config: BotConfig, current_user: dict = Depends(require_admin)):
     """Configure bot tokens (admin only)"""
@@ -469,15 +555,16 @@ async def test_bot_config():
 # ==================== GUILD CONFIG ====================
 
 @api_router.get("/guilds")
-async def list_guilds():
+async def list_guilds(after: Optional[str] = PageAfter, limit: int = PageLimit,
+                      output_format: Optional[str] = OutputFormat, fields: Optional[str] = Fields):
     """List all configured guilds"""
-    guilds = await db.guilds.find({}, {"_id": 0}).to_list(100)
-    return {"guilds": guilds}
+    return await list_response("guilds", get_guild_configs, after=after, limit=limit, output_format=output_format,
+                               fields=parse_fields(fields, GUILD_FIELDS))
 
 @api_router.get("/guilds/{guild_id}")
-async def get_guild(guild_id: str):
+async def get_guild(guild_id: str, fields: Optional[str] = Fields):
     """Get guild configuration"""
-    config = await get_guild_config(guild_id)
+    config = await get_guild_config(guild_id, parse_fields(fields, GUILD_FIELDS))
     return config
 
 @api_router.put("/guilds/{guild_id}")
@@ -487,39 +574,68 @@ async def update_guild(guild_id: str, updates: GuildConfigUpdate):
     config = await update_guild_config(guild_id, update_dict)
     return config
 
+# Dashboard pages poll these together, so responses are cached briefly per guild
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', 10))
+stats_cache = TTLCache(STATS_CACHE_TTL, maxsize=4096)
+
+async def cached_stats(kind: str, guild_id: str, loader) -> dict:
+    """Serve a stats response from the cache or compute it with loader()"""
+    key = (kind, guild_id)
+    stats = stats_cache.get(key)
+    if stats is None:
+        token = stats_cache.token()
+        stats = await loader()
+        stats_cache.set(key, stats, token=token)
+    return stats
+
 @api_router.get("/guilds/{guild_id}/stats")
 async def get_guild_stats(guild_id: str):
     """Get guild statistics"""
-    users = await db.users.count_documents({"guild_id": guild_id})
-    warnings = await db.warnings.count_documents({"guild_id": guild_id})
-    commands = await db.custom_commands.count_documents({"guild_id": guild_id})
-    news = await db.news.count_documents({"guild_id": guild_id})
-    
-    # Top users by XP
-    top_users = await get_leaderboard(guild_id, 5)
-    
-    # Recent mod actions
-    mod_logs = await get_mod_logs(guild_id, 10)
-    
-    return {
-        "total_users": users,
-        "total_warnings": warnings,
-        "total_commands": commands,
-        "total_news": news,
-        "top_users": top_users,
-        "recent_mod_actions": mod_logs
-    }
+    async def load():
+        # Independent queries on different collections, run concurrently
+        users, warnings, commands, news, top_users, mod_logs = await asyncio.gather(
+            db.users.count_documents({"guild_id": guild_id}),
+            db.warnings.count_documents({"guild_id": guild_id}),
+            db.custom_commands.count_documents({"guild_id": guild_id}),
+            db.news.count_documents({"guild_id": guild_id}),
+            get_leaderboard(guild_id, 5),
+            get_mod_logs(guild_id, limit=10)
+        )
+        await attach_user_profiles(guild_id, top_users)
+        return {
+            "total_users": users,
+            "total_warnings": warnings,
+            "total_commands": commands,
+            "total_news": news,
+            "top_users": top_users,
+            "recent_mod_actions": mod_logs["items"]
+        }
+    return await cached_stats("guild", guild_id, load)
+
+@api_router.get("/guilds/{guild_id}/activity")
+async def get_guild_activity(guild_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             granularity: str = Query("hour", pattern="^(hour|day)$")):
+    """Activity time series from the hourly rollups.
+
+    Defaults to the last 24 hours (hourly) or the last 30 days (daily).
+    """
+    from database import get_activity_series
+    end = end or utcnow()
+    start = start or end - (timedelta(days=30) if granularity == "day" else timedelta(hours=24))
+    try:
+        series = await get_activity_series(guild_id, start, end, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"granularity": granularity, "start": start, "end": end, "series": series}
 
 # ==================== MODERATION ====================
 
 @api_router.get("/guilds/{guild_id}/warnings")
-async def list_warnings(guild_id: str, user_id: Optional[str] = None):
+async def list_warnings(guild_id: str, user_id: Optional[str] = None, after: Optional[str] = PageAfter,
+                        limit: int = PageLimit, output_format: Optional[str] = OutputFormat):
     """List warnings"""
-    if user_id:
-        warnings = await get_warnings(guild_id, user_id)
-    else:
-        warnings = await db.warnings.find({"guild_id": guild_id}, {"_id": 0}).to_list(100)
-    return {"warnings": warnings}
+    return await list_response("warnings", get_warnings, guild_id, user_id,
+                               after=after, limit=limit, output_format=output_format)
 
 @api_router.delete("/guilds/{guild_id}/warnings/{user_id}")
 async def clear_user_warnings(guild_id: str, user_id: str):
@@ -528,23 +644,28 @@ async def clear_user_warnings(guild_id: str, user_id: str):
     return {"deleted": count}
 
 @api_router.get("/guilds/{guild_id}/modlogs")
-async def list_mod_logs(guild_id: str, limit: int = 50):
-    """Get moderation logs"""
-    logs = await get_mod_logs(guild_id, limit)
-    return {"logs": logs}
+async def list_mod_logs(guild_id: str, after: Optional[str] = PageAfter,
+                        limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), output_format: Optional[str] = OutputFormat):
+    """Get moderation logs, newest first"""
+    return await list_response("logs", get_mod_logs, guild_id, after=after, limit=limit, output_format=output_format)
 
 # ==================== LEVELING ====================
 
 @api_router.get("/guilds/{guild_id}/leaderboard")
-async def get_guild_leaderboard(guild_id: str, limit: int = 10):
-    """Get XP leaderboard"""
-    users = await get_leaderboard(guild_id, limit)
-    return {"leaderboard": users}
+async def get_guild_leaderboard(guild_id: str, limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                                offset: int = Query(0, ge=0)):
+    """Get XP leaderboard, paged by rank"""
+    from database import get_guild_leaderboard as load_leaderboard
+    board = await load_leaderboard(guild_id)
+    users = await attach_user_profiles(guild_id, await get_leaderboard(guild_id, limit, offset))
+    for rank, user in enumerate(users, offset + 1):
+        user["rank"] = rank
+    return {"leaderboard": users, "offset": offset, "total": len(board)}
 
 @api_router.get("/guilds/{guild_id}/users/{user_id}")
-async def get_user(guild_id: str, user_id: str):
+async def get_user(guild_id: str, user_id: str, fields: Optional[str] = Fields):
     """Get user data"""
-    user = await get_user_data(guild_id, user_id)
+    user = await get_user_data(guild_id, user_id, parse_fields(fields, USER_FIELDS))
     return user
 
 @api_router.put("/guilds/{guild_id}/users/{user_id}")
@@ -562,10 +683,11 @@ async def update_user(guild_id: str, user_id: str, xp: Optional[int] = None, lev
 # ==================== CUSTOM COMMANDS ====================
 
 @api_router.get("/guilds/{guild_id}/commands")
-async def list_custom_commands(guild_id: str):
+async def list_custom_commands(guild_id: str, after: Optional[str] = PageAfter, limit: int = PageLimit,
+                               output_format: Optional[str] = OutputFormat):
     """List custom commands"""
-    commands = await get_custom_commands(guild_id)
-    return {"commands": commands}
+    return await list_response("commands", get_custom_commands, guild_id,
+                               after=after, limit=limit, output_format=output_format)
 
 @api_router.post("/guilds/{guild_id}/commands")
 async def create_custom_command(guild_id: str, cmd: CustomCommandCreate):
@@ -584,15 +706,18 @@ async def remove_custom_command(guild_id: str, name: str):
 # ==================== NEWS ====================
 
 @api_router.get("/guilds/{guild_id}/news")
-async def list_news(guild_id: str):
-    """List news"""
-    news = await get_news(guild_id)
-    return {"news": news}
+async def list_news(guild_id: str, after: Optional[str] = PageAfter, limit: int = PageLimit,
+                    output_format: Optional[str] = OutputFormat):
+    """List news, newest first"""
+    return await list_response("news", get_news, guild_id, after=after, limit=limit, output_format=output_format)
 
 @api_router.post("/guilds/{guild_id}/news")
 async def create_news(guild_id: str, news: NewsCreate):
     """Create news"""
-    item = await add_news(guild_id, news.title, news.content, news.scheduled_for)
+    try:
+        item = await add_news(guild_id, news.title, news.content, news.scheduled_for)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid scheduled_for, expected an ISO 8601 date")
     return item
 
 @api_router.delete("/guilds/{guild_id}/news/{news_id}")
@@ -619,7 +744,7 @@ async def get_permissions(guild_id: str):
 async def update_permissions(guild_id: str, update: PermissionUpdate):
     """Update command permissions"""
     config = await get_guild_config(guild_id)
-    permissions = config.get('command_permissions', {})
+    permissions = dict(config.get('command_permissions', {}))
     permissions[update.command] = update.role_ids
     await update_guild_config(guild_id, {"command_permissions": permissions})
     return {"success": True}
@@ -627,11 +752,11 @@ async def update_permissions(guild_id: str, update: PermissionUpdate):
 # ==================== TEMP CHANNELS API ====================
 
 @api_router.get("/guilds/{guild_id}/temp-channels")
-async def list_temp_channels(guild_id: str):
+async def list_temp_channels(guild_id: str, after: Optional[str] = PageAfter, limit: int = PageLimit,
+                             output_format: Optional[str] = OutputFormat):
     """List all active temp channels"""
-    from database import get_temp_channels
-    channels = await get_temp_channels(guild_id)
-    return {"channels": channels}
+    return await list_response("channels", get_temp_channels, guild_id,
+                               after=after, limit=limit, output_format=output_format)
 
 @api_router.delete("/guilds/{guild_id}/temp-channels/{channel_id}")
 async def remove_temp_channel(guild_id: str, channel_id: str):
@@ -653,16 +778,16 @@ class ReactionRoleCreate(BaseModel):
     color: Optional[str] = "#5865F2"
 
 @api_router.get("/guilds/{guild_id}/reaction-roles")
-async def list_reaction_roles(guild_id: str):
+async def list_reaction_roles(guild_id: str, after: Optional[str] = PageAfter, limit: int = PageLimit,
+                              output_format: Optional[str] = OutputFormat):
     """List all reaction roles"""
-    from database import get_reaction_roles
-    rrs = await get_reaction_roles(guild_id)
-    return {"reaction_roles": rrs}
+    return await list_response("reaction_roles", get_reaction_roles, guild_id,
+                               after=after, limit=limit, output_format=output_format)
 
 @api_router.post("/guilds/{guild_id}/reaction-roles")
 async def create_reaction_role_api(guild_id: str, rr: ReactionRoleCreate):
     """Create a reaction role setup and automatically send to Discord"""
-    from database import create_reaction_role, add_pending_action
+    from database import insert_reaction_role, add_pending_action
     import uuid
     
     # Create single reaction role with all roles embedded
@@ -686,8 +811,7 @@ async def create_reaction_role_api(guild_id: str, rr: ReactionRoleCreate):
         rr_data["emoji"] = rr.roles[0].get("emoji", "")
         rr_data["role_id"] = rr.roles[0].get("role_id", "")
     
-    await db.reaction_roles.insert_one(rr_data)
-    result = {k: v for k, v in rr_data.items() if k != "_id"}
+    result = await insert_reaction_role(rr_data)
     
     # Automatically send to Discord
     if rr.channel_id:
@@ -774,32 +898,97 @@ async def list_active_games(guild_id: str):
 @api_router.get("/guilds/{guild_id}/games/stats")
 async def get_game_stats(guild_id: str):
     """Get game statistics"""
-    total_games = await db.games.count_documents({"guild_id": guild_id})
-    
-    # Get top player
-    pipeline = [
-        {"$match": {"guild_id": guild_id, "winner_id": {"$ne": None}}},
-        {"$group": {"_id": "$winner_id", "wins": {"$sum": 1}}},
-        {"$sort": {"wins": -1}},
-        {"$limit": 1}
-    ]
-    top_player_result = await db.games.aggregate(pipeline).to_list(1)
-    top_player = top_player_result[0]["_id"][:8] + "..." if top_player_result else None
-    
-    return {
-        "total_games": total_games,
-        "top_player": top_player
-    }
+    async def load():
+        pipeline = [
+            {"$match": {"guild_id": guild_id}},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "top_player": [
+                    {"$match": {"winner_id": {"$ne": None}}},
+                    {"$group": {"_id": "$winner_id", "wins": {"$sum": 1}}},
+                    {"$sort": {"wins": -1}},
+                    {"$limit": 1}
+                ]
+            }}
+        ]
+        result = (await db.games.aggregate(pipeline).to_list(1))[0]
+        top_player_result = result["top_player"]
+        return {
+            "total_games": result["total"][0]["count"] if result["total"] else 0,
+            "top_player": top_player_result[0]["_id"][:8] + "..." if top_player_result else None
+        }
+    return await cached_stats("games", guild_id, load)
 
 # ==================== SERVER DATA SYNC API ====================
 
 @api_router.get("/guilds/{guild_id}/server-data")
-async def get_server_data_api(guild_id: str):
+async def get_server_data_api(guild_id: str, fields: Optional[str] = Fields):
     """Get cached server data (roles, channels, emojis)"""
     from database import get_server_data
-    data = await get_server_data(guild_id)
+    data = await get_server_data(guild_id, parse_fields(fields, SERVER_DATA_FIELDS))
     return data
 
+# Typed server data lists: URL segment -> (server data field, fixed filters)
+SERVER_DATA_KINDS = {
+    "roles": ("roles", {}),
+    "channels": ("channels", {}),
+    "text-channels": ("channels", {"type": "text"}),
+    "voice-channels": ("channels", {"type": "voice"}),
+    "categories": ("categories", {}),
+    "emojis": ("emojis", {}),
+}
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+def _not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return since.tzinfo is not None and last_modified.replace(microsecond=0) <= since
+
+@api_router.get("/guilds/{guild_id}/server-data/{kind}")
+async def get_server_data_kind(guild_id: str, kind: str, response: Response, q: Optional[str] = None,
+                               category_id: Optional[str] = None, managed: Optional[bool] = None,
+                               if_none_match: Optional[str] = Header(None),
+                               if_modified_since: Optional[str] = Header(None)):
+    """Get one kind of server data (roles, text-channels, ...), filtered by name (q) and attributes.
+
+    Responses carry an ETag and Last-Modified from the last sync; a matching
+    conditional request gets 304 after reading only last_sync.
+    """
+    from database import get_server_data_version, get_server_entities
+    if kind not in SERVER_DATA_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown server data type: {kind}")
+    field, fixed_filters = SERVER_DATA_KINDS[kind]
+    
+    last_sync = await get_server_data_version(guild_id)
+    if last_sync is None:
+        return {"items": [], "last_sync": None}
+    
+    headers = {
+        "ETag": f'"{int(last_sync.timestamp() * 1000)}"',
+        "Last-Modified": format_datetime(last_sync.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": "private, no-cache"
+    }
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, headers["ETag"])
+    else:
+        not_modified = _not_modified_since(if_modified_since, last_sync)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    
+    filters = dict(fixed_filters)
+    if field == "channels":
+        filters["category_id"] = category_id
+    if field == "roles":
+        filters["managed"] = managed
+    items = await get_server_entities(guild_id, field, q, **filters)
+    response.headers.update(headers)
+    return {"items": items, "last_sync": last_sync}
+
 @api_router.post("/guilds/{guild_id}/server-data/sync")
 async def trigger_server_sync(guild_id: str):
     """Trigger a server data sync (called by bot)"""
@@ -854,30 +1043,26 @@ async def toggle_level_reward_api(guild_id: str, reward_id: str, enabled: bool =
 # ==================== VOICE XP API ====================
 
 @api_router.get("/guilds/{guild_id}/voice-sessions")
-async def list_voice_sessions(guild_id: str):
-    """List active voice sessions"""
-    from database import get_active_voice_sessions
-    sessions = await get_active_voice_sessions(guild_id)
-    return {"sessions": sessions}
+async def list_voice_sessions(guild_id: str, after: Optional[str] = PageAfter, limit: int = PageLimit,
+                              output_format: Optional[str] = OutputFormat):
+    """List active voice sessions, as last mirrored by the bot"""
+    return await list_response("sessions", get_active_voice_sessions, guild_id,
+                               after=after, limit=limit, output_format=output_format)
 
 @api_router.get("/guilds/{guild_id}/voice-stats")
 async def get_voice_stats(guild_id: str):
     """Get voice XP statistics"""
-    # Get total voice time from ended sessions
-    pipeline = [
-        {"$match": {"guild_id": guild_id, "ended_at": {"$ne": None}}},
-        {"$group": {"_id": None, "total_sessions": {"$sum": 1}}}
-    ]
-    result = await db.voice_sessions.aggregate(pipeline).to_list(1)
-    total_sessions = result[0]["total_sessions"] if result else 0
-    
-    # Count active sessions
-    active_sessions = await db.voice_sessions.count_documents({"guild_id": guild_id, "ended_at": None})
-    
-    return {
-        "total_sessions": total_sessions,
-        "active_sessions": active_sessions
-    }
+    async def load():
+        # Finished sessions are in the ledger, open ones in the bot's mirror
+        total, active = await asyncio.gather(
+            db.voice_sessions.count_documents({"guild_id": guild_id}),
+            db.voice_presence.count_documents({"guild_id": guild_id})
+        )
+        return {
+            "total_sessions": total,
+            "active_sessions": active
+        }
+    return await cached_stats("voice", guild_id, load)
 
 # ==================== TICKET SYSTEM API ====================
 
@@ -990,18 +1175,17 @@ async def send_ticket_panel_embed(guild_id: str, panel_id: str, channel_id: str
     return {"queued": True, "action_id": action_id, "message": "Ticket Panel wird gesendet..."}
 
 @api_router.get("/guilds/{guild_id}/tickets")
-async def list_tickets(guild_id: str, status: Optional[str] = None):
-    """List tickets"""
-    from database import get_tickets
-    tickets = await get_tickets(guild_id, status)
-    return {"tickets": tickets}
+async def list_tickets(guild_id: str, status: Optional[str] = None, after: Optional[str] = PageAfter,
+                       limit: int = PageLimit, output_format: Optional[str] = OutputFormat):
+    """List tickets, newest first"""
+    return await list_response("tickets", get_tickets, guild_id, status,
+                               after=after, limit=limit, output_format=output_format)
 
 @api_router.get("/guilds/{guild_id}/tickets/stats")
 async def get_tickets_stats(guild_id: str):
     """Get ticket statistics"""
     from database import get_ticket_stats
-    stats = await get_ticket_stats(guild_id)
-    return stats
+    return await cached_stats("tickets", guild_id, lambda: get_ticket_stats(guild_id))
 
 @api_router.post("/guilds/{guild_id}/tickets/{ticket_id}/claim")
 async def claim_ticket_api(guild_id: str, ticket_id: str, user_id: str):
@@ -1010,6 +1194,7 @@ async def claim_ticket_api(guild_id: str, ticket_id: str, user_id: str):
     result = await claim_ticket(ticket_id, user_id)
     if not result:
         raise HTTPException(status_code=400, detail="Could not claim ticket")
+    stats_cache.invalidate(("tickets", guild_id))
     return {"success": True}
 
 @api_router.post("/guilds/{guild_id}/tickets/{ticket_id}/close")
@@ -1019,6 +1204,7 @@ async def close_ticket_api(guild_id: str, ticket_id: str, user_id: str):
     result = await close_ticket(ticket_id, user_id)
     if not result:
         raise HTTPException(status_code=400, detail="Could not close ticket")
+    stats_cache.invalidate(("tickets", guild_id))
     return {"success": True}
 
 # ==================== MULTI TEMP VOICE CREATORS API ====================
@@ -1103,6 +1289,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_db():
+    """Provision indexes, migrate timestamps and start the cache invalidation watcher"""
+    from database import ensure_indexes, watch_collection_changes, migrate_datetimes
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
+    try:
+        await migrate_datetimes()
+    except Exception as e:
+        logger.error(f"Datetime migration failed: {e}")
+    # Invalidate cached guild configs when the bot or another worker writes
+    app.state.cache_watcher = asyncio.create_task(watch_collection_changes())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
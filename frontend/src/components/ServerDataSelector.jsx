@@ -19,6 +19,27 @@ import axios from "axios";
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
+// Server data endpoint per selector type, each returns only that kind
+const TYPE_ENDPOINTS = {
+  role: "roles",
+  channel: "channels",
+  text_channel: "text-channels",
+  voice_channel: "voice-channels",
+  category: "categories",
+  emoji: "emojis",
+};
+
+// Selectors of the same type on a page share one request. Later loads are
+// revalidated by the browser cache with the ETag and answered with a 304.
+const pendingRequests = new Map();
+
+function fetchEntries(url, headers) {
+  if (!pendingRequests.has(url)) {
+    pendingRequests.set(url, axios.get(url, { headers }).finally(() => pendingRequests.delete(url)));
+  }
+  return pendingRequests.get(url);
+}
+
 /**
  * ServerDataSelector - A searchable dropdown for roles, channels, categories, or emojis
  * 
@@ -40,17 +61,19 @@ export default function ServerDataSelector({
   className = ""
 }) {
   const [open, setOpen] = useState(false);
-  const [serverData, setServerData] = useState(null);
+  const [entries, setEntries] = useState(null);
   const [loading, setLoading] = useState(false);
 
   const fetchServerData = async () => {
+    if (!TYPE_ENDPOINTS[type]) return;
     setLoading(true);
     try {
       const token = localStorage.getItem("token");
-      const res = await axios.get(`${API}/guilds/${guildId}/server-data`, {
-        headers: token ? { Authorization: `Bearer ${token}` } : {},
-      });
-      setServerData(res.data);
+      const res = await fetchEntries(
+        `${API}/guilds/${guildId}/server-data/${TYPE_ENDPOINTS[type]}`,
+        token ? { Authorization: `Bearer ${token}` } : {}
+      );
+      setEntries(res.data.items);
     } catch (e) {
       console.error("Failed to fetch server data:", e);
     }
@@ -58,64 +81,64 @@ export default function ServerDataSelector({
   };
 
   useEffect(() => {
-    if (guildId && open && !serverData) {
+    if (guildId && open && !entries) {
       fetchServerData();
     }
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [guildId, open]);
 
   const items = useMemo(() => {
-    if (!serverData) return [];
+    if (!entries) return [];
 
     switch (type) {
       case "role":
-        return serverData.roles?.map(r => ({
+        return entries.map(r => ({
           id: r.id,
           name: r.name,
           color: r.color,
           icon: <CircleDot className="h-4 w-4" style={{ color: r.color !== "#000000" ? r.color : "#99AAB5" }} />,
-        })) || [];
+        }));
       
       case "channel":
-        return serverData.channels?.map(c => ({
+        return entries.map(c => ({
           id: c.id,
           name: c.name,
           type: c.type,
           icon: c.type === "voice" ? <Volume2 className="h-4 w-4 text-gray-400" /> : <Hash className="h-4 w-4 text-gray-400" />,
-        })) || [];
+        }));
       
       case "text_channel":
-        return serverData.channels?.filter(c => c.type === "text").map(c => ({
+        return entries.map(c => ({
           id: c.id,
           name: c.name,
           icon: <Hash className="h-4 w-4 text-gray-400" />,
-        })) || [];
+        }));
       
       case "voice_channel":
-        return serverData.channels?.filter(c => c.type === "voice").map(c => ({
+        return entries.map(c => ({
           id: c.id,
           name: c.name,
           icon: <Volume2 className="h-4 w-4 text-gray-400" />,
-        })) || [];
+        }));
       
       case "category":
-        return serverData.categories?.map(c => ({
+        return entries.map(c => ({
           id: c.id,
           name: c.name,
           icon: <Folder className="h-4 w-4 text-gray-400" />,
-        })) || [];
+        }));
       
       case "emoji":
-        return serverData.emojis?.map(e => ({
+        return entries.map(e => ({
           id: e.id,
           name: e.name,
           icon: <img src={e.url} alt={e.name} className="h-4 w-4" />,
-        })) || [];
+        }));
       
       default:
         return [];
     }
-  }, [serverData, type]);
+  }, [entries, type]);
 
   const selectedItem = useMemo(() => {
     if (!value) return null;
@@ -190,7 +213,7 @@ export default function ServerDataSelector({
             style={{ scrollbarWidth: 'thin', scrollbarColor: '#5865F2 #2B2D31' }}
           >
             <CommandEmpty className="text-gray-400 text-sm py-6 text-center">
-              {loading ? "Lädt..." : serverData ? `Keine ${typeLabels[type]} gefunden` : "Daten werden geladen..."}
+              {loading ? "Lädt..." : entries ? `Keine ${typeLabels[type]} gefunden` : "Daten werden geladen..."}
             </CommandEmpty>
             <CommandGroup>
               {items.map((item) => (
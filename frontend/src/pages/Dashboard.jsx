@@ -392,9 +392,13 @@ export default function Dashboard() {
                       {index === 0 ? "🥇" : index === 1 ? "🥈" : index === 2 ? "🥉" : `#${index + 1}`}
                     </span>
                     <div className="flex-1">
-                      <p className="text-white font-medium font-mono text-sm">
-                        {user.user_id.slice(0, 8)}...
-                      </p>
+                      {user.display_name ? (
+                        <p className="text-white font-medium text-sm">{user.display_name}</p>
+                      ) : (
+                        <p className="text-white font-medium font-mono text-sm">
+                          {user.user_id.slice(0, 8)}...
+                        </p>
+                      )}
                       <p className="text-xs text-gray-400">Level {user.level}</p>
                     </div>
                     <span className="text-[#5865F2] font-bold">
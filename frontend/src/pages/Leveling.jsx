@@ -597,7 +597,7 @@ export default function Leveling() {
                       {index + 1}
                     </div>
                     <div>
-                      <p className="text-white font-medium">{user.user_id.slice(0, 8)}...</p>
+                      <p className="text-white font-medium">{user.display_name || `${user.user_id.slice(0, 8)}...`}</p>
                       <div className="flex items-center gap-3 text-xs text-gray-500">
                         <span>💬 {user.messages || 0}</span>
                         <span>🎤 {user.voice_minutes || 0} min</span>
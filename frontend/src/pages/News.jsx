@@ -75,7 +75,8 @@ export default function News() {
       await axios.post(`${API}/guilds/${guildId}/news`, {
         title: newNews.title,
         content: newNews.content,
-        scheduled_for: newNews.scheduled_for || null,
+        // datetime-local is the browser's local time, the bot schedules in UTC
+        scheduled_for: newNews.scheduled_for ? new Date(newNews.scheduled_for).toISOString() : null,
       });
       toast.success(newNews.scheduled_for ? "News geplant!" : "News erstellt!");
       setNewNews({ title: "", content: "", scheduled_for: "" });
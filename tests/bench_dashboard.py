@@ -0,0 +1,134 @@
+"""
+Benchmark: dashboard stats load time.
+
+Fires the stats requests of the dashboard pages concurrently, like the
+frontend does, and reports the wall time per round. Run it once on the
+old and once on the new backend to compare.
+
+Without a running backend, set BENCH_MONGOMOCK_RTT_MS: the backend in
+BENCH_BACKEND_DIR (default: this checkout) is then served in-process on
+mongomock with that simulated round trip (see bench_mongomock.py), seeded
+with BENCH_SEED_SCALE (default 1) times a mid-sized guild.
+
+Run with: python tests/bench_dashboard.py [rounds]
+"""
+
+import asyncio
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001').rstrip('/')
+GUILD_ID = os.environ.get('BENCH_GUILD_ID', "807292920734547969")
+
+ENDPOINTS = [
+    f"/api/guilds/{GUILD_ID}/stats",
+    f"/api/guilds/{GUILD_ID}/tickets/stats",
+    f"/api/guilds/{GUILD_ID}/voice-stats",
+    f"/api/guilds/{GUILD_ID}/games/stats",
+]
+
+
+async def seed(db, scale: int):
+    """Documents the stats endpoints read, for one guild"""
+    rng = random.Random(1)
+    now = datetime.now(timezone.utc)
+    user_ids = [str(100000 + i) for i in range(2000 * scale)]
+    await db.users.insert_many([
+        {"guild_id": GUILD_ID, "user_id": user_id, "xp": rng.randint(0, 50000), "level": 0, "messages": 0}
+        for user_id in user_ids
+    ])
+    await db.warnings.insert_many([
+        {"guild_id": GUILD_ID, "user_id": rng.choice(user_ids), "reason": "bench", "timestamp": now}
+        for _ in range(200 * scale)
+    ])
+    await db.custom_commands.insert_many([
+        {"guild_id": GUILD_ID, "name": f"cmd{i}", "response": "bench"} for i in range(20 * scale)
+    ])
+    await db.news.insert_many([
+        {"guild_id": GUILD_ID, "id": str(uuid.uuid4()), "title": "bench", "created_at": now} for _ in range(50 * scale)
+    ])
+    await db.mod_logs.insert_many([
+        {"guild_id": GUILD_ID, "action": "warn", "user_id": rng.choice(user_ids), "timestamp": now - timedelta(minutes=i)}
+        for i in range(500 * scale)
+    ])
+    await db.tickets.insert_many([
+        {"guild_id": GUILD_ID, "id": str(uuid.uuid4()), "user_id": rng.choice(user_ids),
+         "status": rng.choice(["open", "claimed", "closed", "closed", "closed"]), "created_at": now}
+        for _ in range(1000 * scale)
+    ])
+    await db.voice_sessions.insert_many([
+        {"guild_id": GUILD_ID, "id": str(uuid.uuid4()), "user_id": rng.choice(user_ids),
+         "started_at": now - timedelta(hours=1), "ended_at": now}
+        for _ in range(5000 * scale)
+    ])
+    await db.games.insert_many([
+        {"guild_id": GUILD_ID, "id": str(uuid.uuid4()), "game_type": "trivia",
+         "winner_id": rng.choice(user_ids + [None]), "created_at": now}
+        for _ in range(2000 * scale)
+    ])
+
+
+def serve_in_process(rtt_ms: float) -> str:
+    """Start the backend on mongomock in a background thread, returns its base URL"""
+    from bench_mongomock import use_mongomock
+    use_mongomock(rtt_ms)
+
+    backend = Path(os.environ.get("BENCH_BACKEND_DIR", Path(__file__).resolve().parent.parent / "backend"))
+    sys.path.insert(0, str(backend.resolve()))
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "bench_dashboard")
+    import uvicorn
+    import database
+    import server
+
+    asyncio.run(seed(database.db, int(os.environ.get("BENCH_SEED_SCALE", 1))))
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    backend_server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=backend_server.run, daemon=True).start()
+    while not backend_server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def load_dashboard(session: requests.Session, pool: ThreadPoolExecutor) -> float:
+    started = time.perf_counter()
+    responses = list(pool.map(lambda path: session.get(f"{BASE_URL}{path}"), ENDPOINTS))
+    elapsed = time.perf_counter() - started
+    for response in responses:
+        response.raise_for_status()
+    return elapsed
+
+
+def main():
+    global BASE_URL
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    if os.environ.get("BENCH_MONGOMOCK_RTT_MS"):
+        BASE_URL = serve_in_process(float(os.environ["BENCH_MONGOMOCK_RTT_MS"]))
+    session = requests.Session()
+    with ThreadPoolExecutor(len(ENDPOINTS)) as pool:
+        first = load_dashboard(session, pool)
+        timings = [load_dashboard(session, pool) for _ in range(rounds)]
+
+    timings.sort()
+    print(f"{BASE_URL} guild {GUILD_ID}, {len(ENDPOINTS)} endpoints per load")
+    print(f"first load  {first * 1000:8.1f} ms")
+    print(f"p50         {statistics.median(timings) * 1000:8.1f} ms")
+    print(f"p95         {timings[int(len(timings) * 0.95) - 1] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
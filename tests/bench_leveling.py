@@ -0,0 +1,41 @@
+"""
+Benchmark: table based level math vs. the original loops.
+
+Run with: python tests/bench_leveling.py
+"""
+
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from leveling import calculate_level, xp_for_level
+from test_leveling import loop_calculate_level, loop_xp_for_level
+
+
+def main():
+    rng = random.Random(42)
+    xps = [rng.randint(0, 5_000_000) for _ in range(10_000)]
+    levels = [calculate_level(xp) for xp in xps]
+
+    calculate_level(max(xps))  # Build the table up front, like a warm process
+
+    cases = [
+        ("calculate_level", lambda: [loop_calculate_level(xp) for xp in xps], lambda: [calculate_level(xp) for xp in xps]),
+        ("xp_for_level", lambda: [loop_xp_for_level(lv) for lv in levels], lambda: [xp_for_level(lv) for lv in levels]),
+        ("/rank (2x xp_for_level)", lambda: [loop_xp_for_level(lv + 1) - loop_xp_for_level(lv) for lv in levels],
+         lambda: [xp_for_level(lv + 1) - xp_for_level(lv) for lv in levels]),
+    ]
+
+    print(f"{len(xps)} calls per run, best of 5")
+    for name, old, new in cases:
+        old_time = min(timeit.repeat(old, number=1, repeat=5))
+        new_time = min(timeit.repeat(new, number=1, repeat=5))
+        print(f"{name:26} loop {old_time * 1000:8.2f} ms   table {new_time * 1000:6.2f} ms   {old_time / new_time:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+In-memory MongoDB stand-in for the benchmarks, when no server is available.
+
+use_mongomock() replaces motor's AsyncIOMotorClient with mongomock-motor and
+adds a simulated network round trip to every collection operation and cursor
+read, so concurrent requests interleave like they do against a real server.
+Absolute numbers are not comparable to a real deployment; the number of round
+trips and races between them are.
+
+Needs: pip install mongomock mongomock-motor
+Call it before importing mongo / database.
+"""
+
+import asyncio
+import functools
+
+
+def _with_latency(method, rtt: float):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        await asyncio.sleep(rtt)
+        return await method(*args, **kwargs)
+    return wrapper
+
+
+def _with_first_batch_latency(method, rtt: float):
+    # A cursor pays one round trip for its first batch, not one per document
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if not self.__dict__.get("_bench_fetched"):
+            self.__dict__["_bench_fetched"] = True
+            await asyncio.sleep(rtt)
+        return await method(self, *args, **kwargs)
+    return wrapper
+
+
+def use_mongomock(rtt_ms: float = 1.0):
+    import motor.motor_asyncio
+    import mongomock_motor
+    from mongomock_motor import AsyncMongoMockClient
+
+    rtt = rtt_ms / 1000
+    # The masquerading wrappers subclass the real implementations, patch those
+    collection = mongomock_motor.AsyncMongoMockCollection.__mro__[1]
+    for name in (
+        "bulk_write", "count_documents", "delete_many", "delete_one", "distinct", "find_one",
+        "find_one_and_delete", "find_one_and_update", "insert_many", "insert_one",
+        "replace_one", "update_many", "update_one"
+    ):
+        setattr(collection, name, _with_latency(getattr(collection, name), rtt))
+    for cls in (mongomock_motor.AsyncCursor, mongomock_motor.AsyncCommandCursor):
+        base = cls.__mro__[1]
+        for name in ("to_list", "next", "__anext__"):
+            setattr(base, name, _with_first_batch_latency(getattr(base, name), rtt))
+
+    # Every client of the process sees the same data, like clients of one server
+    shared = {}
+
+    def client(*args, **kwargs):
+        tz_aware = kwargs.get("tz_aware", False)
+        if tz_aware not in shared:
+            shared[tz_aware] = AsyncMongoMockClient(tz_aware=tz_aware)
+        return shared[tz_aware]
+
+    motor.motor_asyncio.AsyncIOMotorClient = client
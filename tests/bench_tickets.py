@@ -0,0 +1,98 @@
+"""
+Benchmark: ticket creation bursts, old find/to_list check vs. atomic ticket slots.
+
+Needs a MongoDB reachable via MONGO_URL (default mongodb://localhost:27017).
+Runs against a throwaway database that is dropped afterwards. Without a server,
+set BENCH_MONGOMOCK_RTT_MS to run against mongomock with that simulated round
+trip per operation (see bench_mongomock.py).
+
+Run with: python tests/bench_tickets.py [users] [clicks_per_user]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = f"bench_tickets_{uuid.uuid4().hex[:8]}"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+if os.environ.get("BENCH_MONGOMOCK_RTT_MS"):
+    from bench_mongomock import use_mongomock
+    use_mongomock(float(os.environ["BENCH_MONGOMOCK_RTT_MS"]))
+
+import database
+from mongo import get_client
+from database import (
+    db, ensure_indexes, create_ticket_panel, create_ticket, increment_ticket_counter,
+    reserve_ticket_slot, MAX_OPEN_TICKETS
+)
+
+GUILD_ID = "1"
+
+
+async def legacy_create(panel_id: str, user_id: str) -> bool:
+    """Previous path: find + to_list to count, then two separate writes"""
+    existing = await db.tickets.find({
+        "guild_id": GUILD_ID,
+        "user_id": user_id,
+        "status": {"$in": ["open", "claimed"]}
+    }).to_list(100)
+    if len(existing) >= MAX_OPEN_TICKETS:
+        return False
+    number = await increment_ticket_counter(panel_id)
+    await create_ticket(GUILD_ID, panel_id, {"channel_id": uuid.uuid4().hex, "user_id": user_id, "ticket_number": number})
+    return True
+
+
+async def slot_create(panel_id: str, user_id: str) -> bool:
+    """New path: atomic slot reservation, then the counter and the insert"""
+    if not await reserve_ticket_slot(GUILD_ID, user_id):
+        return False
+    number = await increment_ticket_counter(panel_id)
+    await create_ticket(GUILD_ID, panel_id, {"channel_id": uuid.uuid4().hex, "user_id": user_id, "ticket_number": number})
+    return True
+
+
+async def run(name: str, create, users: int, clicks: int):
+    await db.tickets.delete_many({})
+    await db.ticket_slots.delete_many({})
+    panel = await create_ticket_panel(GUILD_ID, {"title": "Bench"})
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        create(panel["id"], str(user)) for user in range(users) for _ in range(clicks)
+    ))
+    elapsed = time.perf_counter() - started
+
+    over_limit = await db.tickets.aggregate([
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": MAX_OPEN_TICKETS}}},
+        {"$count": "users"}
+    ]).to_list(1)
+    numbers = await db.tickets.distinct("ticket_number")
+    created = sum(results)
+
+    print(
+        f"{name:8} {len(results):6} clicks in {elapsed:6.2f}s  {len(results) / elapsed:8.0f} clicks/s  "
+        f"created {created:5}  users over limit {over_limit[0]['users'] if over_limit else 0:4}  "
+        f"duplicate numbers {created - len(numbers)}"
+    )
+
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    clicks = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    await ensure_indexes()
+    try:
+        await run("legacy", legacy_create, users, clicks)
+        await run("slots", slot_create, users, clicks)
+    finally:
+        await get_client().drop_database(database.db.name)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
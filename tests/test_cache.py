@@ -0,0 +1,60 @@
+"""
+TTLCache tests - expiry, write-order eviction at maxsize and stale-write tokens.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import cache
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(monkeypatch, ttl, maxsize=None):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return TTLCache(ttl, maxsize=maxsize), clock
+
+
+class TestTTLCache:
+    def test_entries_expire(self, monkeypatch):
+        c, clock = make_cache(monkeypatch, 10)
+        c.set("a", 1)
+        assert c.get("a") == 1
+        clock.now += 11
+        assert c.get("a") is None
+        assert "a" not in c
+
+    def test_maxsize_drops_oldest_write(self, monkeypatch):
+        c, _ = make_cache(monkeypatch, 10, maxsize=3)
+        for key in "abc":
+            c.set(key, key)
+        c.set("a", "a2")  # rewrite moves "a" behind "c"
+        c.set("d", "d")
+        assert "b" not in c
+        assert [c.get(k) for k in "acd"] == ["a2", "c", "d"]
+        assert len(c) == 3
+
+    def test_expired_entries_are_pruned_on_set(self, monkeypatch):
+        c, clock = make_cache(monkeypatch, 10, maxsize=100)
+        for i in range(50):
+            c.set(i, i)
+        clock.now += 11
+        c.set("new", 1)
+        assert len(c) == 1
+
+    def test_stale_token_is_dropped(self, monkeypatch):
+        c, _ = make_cache(monkeypatch, 10)
+        token = c.token()
+        c.invalidate("a")
+        c.set("a", 1, token=token)
+        assert "a" not in c
@@ -0,0 +1,134 @@
+"""
+Level curve tests - checks the table based level math against the
+original loop implementations for exact equivalence.
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from leveling import LevelCurve, Leaderboard, calculate_level, xp_for_level, level_curve_for_config, get_level_curve
+
+
+def loop_calculate_level(xp, base=100, factor=1.1):
+    """Original calculate_level, generalized to a base/factor"""
+    level = 0
+    required = int(base)
+    total = 0
+    while total + required <= xp:
+        total += required
+        level += 1
+        required = int(base * (factor ** level))
+    return level
+
+
+def loop_xp_for_level(level, base=100, factor=1.1):
+    """Original xp_for_level, generalized to a base/factor"""
+    total = 0
+    for i in range(level):
+        total += int(base * (factor ** i))
+    return total
+
+
+class TestDefaultCurve:
+    """Default curve must match the original functions exactly"""
+
+    def test_thresholds_match(self):
+        for level in range(0, 300):
+            assert xp_for_level(level) == loop_xp_for_level(level)
+
+    def test_levels_match_around_thresholds(self):
+        for level in range(0, 120):
+            threshold = loop_xp_for_level(level)
+            for xp in (threshold - 1, threshold, threshold + 1):
+                assert calculate_level(xp) == loop_calculate_level(xp)
+
+    def test_levels_match_random_xp(self):
+        rng = random.Random(1234)
+        for _ in range(5000):
+            xp = rng.randint(0, 10_000_000)
+            assert calculate_level(xp) == loop_calculate_level(xp)
+
+    def test_negative_values(self):
+        assert calculate_level(-50) == loop_calculate_level(-50) == 0
+        assert xp_for_level(-3) == loop_xp_for_level(-3) == 0
+
+    def test_roundtrip(self):
+        for level in range(0, 200):
+            assert calculate_level(xp_for_level(level)) == level
+            if level:
+                assert calculate_level(xp_for_level(level) - 1) == level - 1
+
+
+class TestCustomCurves:
+    """Per-guild curves"""
+
+    @pytest.mark.parametrize("base,factor", [(50, 1.05), (250, 1.25), (10, 1.01), (1000, 2.0), (75, 1.1)])
+    def test_custom_curve_matches_loop(self, base, factor):
+        curve = LevelCurve(base, factor)
+        rng = random.Random(base)
+        for level in range(0, 80):
+            assert curve.xp_for_level(level) == loop_xp_for_level(level, base, factor)
+        for _ in range(2000):
+            xp = rng.randint(0, curve.xp_for_level(80))
+            assert curve.level_for_xp(xp) == loop_calculate_level(xp, base, factor)
+
+    def test_config_curve(self):
+        curve = level_curve_for_config({"level_curve_base": 200, "level_curve_factor": 1.2})
+        assert curve.xp_for_level(2) == 200 + 240
+        assert curve is level_curve_for_config({"level_curve_base": 200, "level_curve_factor": 1.2})
+
+    def test_config_falls_back_to_default(self):
+        assert level_curve_for_config({}) is get_level_curve()
+        assert level_curve_for_config(None) is get_level_curve()
+        assert level_curve_for_config({"level_curve_base": 100, "level_curve_factor": 0.5}) is get_level_curve()
+
+    def test_invalid_curve(self):
+        with pytest.raises(ValueError):
+            LevelCurve(0, 1.1)
+        with pytest.raises(ValueError):
+            LevelCurve(100, 0.9)
+
+
+class TestLeaderboard:
+    """Sorted leaderboard must agree with a full sort"""
+
+    @staticmethod
+    def naive_order(xp_by_user):
+        return sorted(xp_by_user.items(), key=lambda item: (-item[1], item[0]))
+
+    def test_random_updates_match_full_sort(self):
+        rng = random.Random(7)
+        board = Leaderboard()
+        board.load([(str(u), rng.randint(0, 1000)) for u in range(200)])
+        expected = {user_id: xp for user_id, xp in board.page(0, 1000)}
+
+        for _ in range(2000):
+            user_id = str(rng.randint(0, 250))
+            if rng.random() < 0.05:
+                board.remove(user_id)
+                expected.pop(user_id, None)
+            else:
+                xp = (expected.get(user_id) or 0) + rng.randint(0, 50)
+                board.set(user_id, xp)
+                expected[user_id] = xp
+
+        order = self.naive_order(expected)
+        assert board.page(0, len(order)) == order
+        for position, (user_id, _) in enumerate(order, 1):
+            assert board.rank(user_id) == position
+        assert len(board) == len(expected)
+
+    def test_paging_and_unknown_user(self):
+        board = Leaderboard()
+        board.load([("a", 10), ("b", 30), ("c", 20), ("d", 20)])
+        assert board.page(0, 2) == [("b", 30), ("c", 20)]
+        assert board.page(2, 2) == [("d", 20), ("a", 10)]
+        assert board.page(10, 2) == []
+        assert board.rank("zzz") is None
+        board.set("a", 40)
+        assert board.rank("a") == 1 and board.rank("b") == 2